@@ -0,0 +1,76 @@
+# Shared by the benchmarks: latency summaries, peak memory and the report
+# format, so two runs can be compared with benchmarks/compare.py.
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+root_dir = Path(__file__).resolve().parents[1]
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict[str, float]:
+    # Seconds in, milliseconds out
+    if not latencies:
+        return {"count": 0, "throughput": 0.0}
+    ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": len(latencies),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "mean_ms": float(ms.mean()),
+        "max_ms": float(ms.max()),
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=root_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(benchmark: str, config: dict, results: dict, as_json: bool) -> None:
+    output = {
+        "benchmark": benchmark,
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": config,
+        "results": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if as_json:
+        print(json.dumps(output, indent=2))
+        return
+
+    print(f"{benchmark} @ {output['revision'] or 'unknown revision'}")
+    print("  " + ", ".join(f"{k}={v}" for k, v in config.items()))
+    for name, result in results.items():
+        print(f"{name}:")
+        for key, value in result.items():
+            if isinstance(value, dict):
+                value = ", ".join(f"{k}={v}" for k, v in value.items())
+            elif isinstance(value, float):
+                value = f"{value:.3f}"
+            print(f"  {key}: {value}")
+    print(f"peak RSS: {output['peak_rss_mb']:.1f} MB")
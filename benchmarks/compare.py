@@ -0,0 +1,65 @@
+# Compares two --json reports of the same benchmark, metric by metric.
+import json
+import sys
+
+
+def show_help():
+    print("Usage: compare.py BASELINE.json CANDIDATE.json")
+    print(
+        "Prints every number in the results of both reports (and peak RSS) with\n"
+        "the relative change from BASELINE to CANDIDATE."
+    )
+
+
+def flatten(value, prefix: str = "") -> dict[str, float]:
+    if isinstance(value, dict):
+        numbers = {}
+        for key, item in value.items():
+            numbers.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+        return numbers
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: float(value)}
+    return {}
+
+
+def metrics(report: dict) -> dict[str, float]:
+    return {**flatten(report["results"]), "peak_rss_mb": report["peak_rss_mb"]}
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if "-h" in args or "--help" in args:
+        show_help()
+        sys.exit()
+    if len(args) != 2:
+        show_help()
+        sys.exit(1)
+
+    with open(args[0]) as f:
+        baseline = json.load(f)
+    with open(args[1]) as f:
+        candidate = json.load(f)
+
+    if baseline["benchmark"] != candidate["benchmark"]:
+        print(f"Cannot compare {baseline['benchmark']} with {candidate['benchmark']}")
+        sys.exit(1)
+    if baseline["config"] != candidate["config"]:
+        print("Warning: the reports were run with different options")
+
+    before, after = metrics(baseline), metrics(candidate)
+    print(f"{baseline['benchmark']}: {baseline['revision']} -> {candidate['revision']}")
+    width = max(len(k) for k in before | after)
+    for key in dict.fromkeys([*before, *after]):
+        a, b = before.get(key), after.get(key)
+        if a is None or b is None:
+            change = "only in " + ("candidate" if a is None else "baseline")
+        elif a == b:
+            change = ""
+        elif a:
+            change = f"{(b - a) / abs(a) * 100:+.1f}%"
+        else:
+            change = "new"
+        a = "-" if a is None else f"{a:.3f}"
+        b = "-" if b is None else f"{b:.3f}"
+        print(f"{key:<{width}}  {a:>14}  {b:>14}  {change}")
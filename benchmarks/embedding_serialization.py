@@ -0,0 +1,109 @@
+# Compares the text and packed GetEmbeddingResponse formats: server-side
+# serialization time, response size and client-side parse time.
+import os
+import sys
+import ast
+import json
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+root_dir = Path(os.path.abspath(__file__)).parents[1]
+sys.path.append(str(root_dir))
+
+from src.generated.agent.main_pb2 import GetEmbeddingResponse, VectorFormat
+
+
+def show_help():
+    print("Usage: embedding_serialization.py [--json] [repeats]")
+    print(
+        "Encodes the vectors in generated/tensors/common_words.json in every\n"
+        "response format and reports mean time per response and payload size."
+    )
+
+
+def text_response(vector: np.ndarray) -> bytes:
+    return GetEmbeddingResponse(vectors=str(vector.tolist())).SerializeToString()
+
+
+def packed_response(vector: np.ndarray, dtype: str, fmt: int) -> bytes:
+    return GetEmbeddingResponse(
+        packed=np.asarray(vector, dtype=dtype).tobytes(),
+        format=fmt,
+        dimensions=len(vector),
+    ).SerializeToString()
+
+
+def parse_text(payload: bytes) -> np.ndarray:
+    return np.asarray(
+        ast.literal_eval(GetEmbeddingResponse.FromString(payload).vectors),
+        dtype=np.float32,
+    )
+
+
+def parse_packed(payload: bytes, dtype: str) -> np.ndarray:
+    return np.frombuffer(GetEmbeddingResponse.FromString(payload).packed, dtype=dtype)
+
+
+def bench(fn, items, repeats: int) -> float:
+    # Mean seconds per item, best of `repeats`
+    return min(
+        timeit.repeat(lambda: [fn(i) for i in items], number=1, repeat=repeats)
+    ) / len(items)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if "-h" in args or "--help" in args:
+        show_help()
+        sys.exit()
+
+    as_json = "--json" in args
+    args = [a for a in args if a != "--json"]
+    repeats = int(args[0]) if args else 5
+
+    with open(root_dir.joinpath("generated/tensors/common_words.json")) as f:
+        vectors = [np.asarray(v, dtype=np.float32) for v in json.load(f).values()]
+
+    formats = {
+        "text": (
+            text_response,
+            parse_text,
+        ),
+        "float32": (
+            lambda v: packed_response(v, "<f4", VectorFormat.VECTOR_FORMAT_FLOAT32),
+            lambda p: parse_packed(p, "<f4"),
+        ),
+        "float16": (
+            lambda v: packed_response(v, "<f2", VectorFormat.VECTOR_FORMAT_FLOAT16),
+            lambda p: parse_packed(p, "<f2"),
+        ),
+    }
+
+    results = {}
+    for name, (serialize, parse) in formats.items():
+        payloads = [serialize(v) for v in vectors]
+        error = max(
+            float(np.abs(parse(p).astype(np.float32) - v).max())
+            for p, v in zip(payloads, vectors)
+        )
+        results[name] = {
+            "serialize_us": bench(serialize, vectors, repeats) * 1e6,
+            "parse_us": bench(parse, payloads, repeats) * 1e6,
+            "bytes": sum(len(p) for p in payloads) / len(payloads),
+            "max_abs_error": error,
+        }
+
+    if as_json:
+        print(json.dumps({"vectors": len(vectors), "results": results}, indent=2))
+        sys.exit()
+
+    print(f"{len(vectors)} vectors of {len(vectors[0])} dimensions")
+    print(f"{'format':<10}{'serialize':>14}{'parse':>14}{'bytes':>10}{'max error':>12}")
+    for name, r in results.items():
+        print(
+            f"{name:<10}{r['serialize_us']:>12.1f}us{r['parse_us']:>12.1f}us"
+            f"{r['bytes']:>10.0f}{r['max_abs_error']:>12.2e}"
+        )
@@ -0,0 +1,207 @@
+# In-process stand-in for the kueater schema, so the Postgres repository can be
+# benchmarked without a database. Every statement it sends is answered from an
+# InMemoryRepository (menu items of data/menuitems-*.csv, synthetic users) and
+# counted as one round trip, with an optional simulated network latency.
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+from importlib import import_module
+
+import numpy as np
+
+class FakeKueater:
+    def __init__(self, data, latency: float = 0.0):
+        # `data` is an InMemoryRepository, its users and written scores are
+        # the ones served and updated here
+        self.data = data
+        # Seconds every round trip takes
+        self.latency = latency
+        self.round_trips: Counter[str] = Counter()
+        self.connections = 0
+        self._embeddings: list[str] | None = None
+
+    @property
+    def users(self) -> dict:
+        return self.data.users
+
+    @property
+    def menuitem_scores(self) -> dict[str, dict[str, tuple[float, str]]]:
+        return self.data.menuitem_scores
+
+    def embeddings(self) -> list[str]:
+        # pgvector's text form, built once
+        if self._embeddings is None:
+            self._embeddings = [
+                "[" + ",".join(f"{x:.6f}" for x in v) + "]"
+                for v in np.asarray(self.data.embeddings)
+            ]
+        return self._embeddings
+
+    def reset_counters(self) -> None:
+        self.round_trips.clear()
+        self.connections = 0
+
+    def stats(self) -> dict[str, int | dict[str, int]]:
+        return {
+            "connections": self.connections,
+            "round_trips": sum(self.round_trips.values()),
+            "by_statement": dict(self.round_trips.most_common()),
+        }
+
+    async def round_trip(self, label: str) -> None:
+        self.round_trips[label] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def answer(self, query: str, params) -> tuple[str, list[dict], int]:
+        # (Statement label, rows, rows affected)
+        if "md5(" in query:
+            return "catalog_version", [{"version": self.data.version}], 1
+        if "get_all_menuitems_with_ingredients" in query:
+            rows = [
+                {
+                    "menu_id": m.id,
+                    "name": m.name,
+                    "ingredients": [
+                        {"id": i, "name": self.data.ingredients[i]}
+                        for i in m.ingredient_ids
+                    ],
+                }
+                for m in self.data.menus
+            ]
+            return "menuitems", rows, len(rows)
+        if "LEFT JOIN kueater.stall_menu" in query:
+            rows = [
+                {"menu_id": m.id, "cuisine": m.cuisine, "stall_id": m.stall_id}
+                for m in self.data.menus
+            ]
+            return "menuitem_details", rows, len(rows)
+        if "embedding::text" in query:
+            rows = [
+                {"object_id": m.id, "embedding": e}
+                for m, e in zip(self.data.menus, self.embeddings())
+            ]
+            return "menuitem_embeddings", rows, len(rows)
+        if "json_object_agg(diet" in query:
+            rows = [
+                {"ingredient_id": i, "diets": d, "allergens": a}
+                for i, (d, a) in self.data.ingredient_scores.items()
+            ]
+            return "ingredient_scores", rows, len(rows)
+        if "FROM kueater.ingredient_diet_score)" in query:
+            return "ingredient_scores_version", [{"version": self.data.version}], 1
+        if "DISTINCT ON (u.id)" in query:
+            rows = [
+                {"user_id": u, **vars(self.users[u])}
+                for u in sorted(set(params[0]))
+                if u in self.users
+            ]
+            return "user_contexts", rows, len(rows)
+        if "SELECT DISTINCT upp.user_id" in query:
+            rows = [{"user_id": u} for u in sorted(self.users)]
+            return "all_user_ids", rows, len(rows)
+        if "FROM unnest(%s::uuid[]) AS id" in query:
+            for user_id in params[0]:
+                self.menuitem_scores.pop(user_id, None)
+            return "stale_users", [], len(params[0])
+        if "UPDATE kueater.menuitem_scores" in query:
+            menu_ids, scores, reasonings, user_id = params
+            rows = self.menuitem_scores.get(user_id, {})
+            updated = 0
+            for menu_id, score, reasoning in zip(menu_ids, scores, reasonings):
+                if menu_id in rows:
+                    rows[menu_id] = (score, reasoning)
+                    updated += 1
+            return "update_scores", [], updated
+        if "refresh_menuitem_scores" in query:
+            return "refresh", [{"refresh_menuitem_scores": None}], 1
+
+        raise NotImplementedError(f"The fake kueater schema cannot answer: {query}")
+
+    def pool(self, max_size: int = 4) -> "FakePool":
+        return FakePool(self, max_size)
+
+
+class FakeCopy:
+    def __init__(self, db: FakeKueater):
+        self.db = db
+
+    async def write_row(self, row: tuple) -> None:
+        user_id, menu_id, score, reasoning = row
+        self.db.menuitem_scores.setdefault(str(user_id), {})[str(menu_id)] = (
+            score,
+            reasoning,
+        )
+
+
+class FakeCursor:
+    def __init__(self, db: FakeKueater, row_factory=None):
+        self.db = db
+        self.row_factory = row_factory
+        self.rows: list = []
+        self.rowcount = -1
+
+    async def __aenter__(self) -> "FakeCursor":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+    async def execute(self, query, params=None) -> "FakeCursor":
+        if not isinstance(query, str):
+            query = query.as_string(None)
+        label, rows, self.rowcount = self.db.answer(query.replace('"', ""), params)
+        await self.db.round_trip(label)
+        # Tuples, unless a row factory was asked for (always dict_row here)
+        self.rows = (
+            rows if self.row_factory is not None else [tuple(r.values()) for r in rows]
+        )
+        return self
+
+    async def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    async def fetchall(self) -> list:
+        return self.rows
+
+    @asynccontextmanager
+    async def copy(self, statement):
+        # One round trip, rows are streamed
+        yield FakeCopy(self.db)
+        await self.db.round_trip("copy_scores")
+
+
+class FakeConnection:
+    def __init__(self, db: FakeKueater):
+        self.db = db
+
+    def cursor(self, row_factory=None) -> FakeCursor:
+        return FakeCursor(self.db, row_factory)
+
+    async def execute(self, query, params=None) -> FakeCursor:
+        return await FakeCursor(self.db).execute(query, params)
+
+    @asynccontextmanager
+    async def transaction(self):
+        await self.db.round_trip("begin")
+        yield
+        await self.db.round_trip("commit")
+
+
+class FakePool:
+    def __init__(self, db: FakeKueater, max_size: int = 4):
+        self.db = db
+        self._slots = asyncio.Semaphore(max_size)
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self._slots:
+            self.db.connections += 1
+            yield FakeConnection(self.db)
+
+
+def install(pool: FakePool, package: str = "src.model") -> None:
+    # Recommendation runs use the Postgres repository on the fake pool.
+    # `package` is "model" when imported the way server.py does.
+    repository = import_module(f"{package}.repository")
+    repository.set_repository(repository.PostgresRepository(pool))
@@ -0,0 +1,211 @@
+# Load generator for the GetEmbedding and NewRecommendations RPCs. Without
+# --target the agent is started in this process on the kueater fake, so the
+# encoder, the scheduler and the database round trips can be reported too.
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from grpc import aio
+
+root_dir = Path(os.path.abspath(__file__)).parents[1]
+sys.path.append(str(root_dir))
+# Imported the way server.py imports them
+sys.path.append(str(root_dir.joinpath("src")))
+
+from benchmarks.common import report, summarize
+from benchmarks.fake_kueater import FakeKueater, install
+from generated.agent.main_pb2 import (
+    GetEmbeddingRequest,
+    NewRecommendationsRequest,
+    VectorFormat,
+)
+from generated.agent.main_pb2_grpc import KUEaterEmbeddingAgentStub
+
+FORMATS = {
+    "text": VectorFormat.VECTOR_FORMAT_TEXT,
+    "float32": VectorFormat.VECTOR_FORMAT_FLOAT32,
+    "float16": VectorFormat.VECTOR_FORMAT_FLOAT16,
+}
+
+
+def show_help():
+    print(
+        "Usage: grpc_load.py [--target HOST:PORT] [--rpc embedding|recommendations|all]\n"
+        "                    [--requests N] [--concurrency N] [--format FORMAT]\n"
+        "                    [--users N] [--db-latency MS] [--seed N] [--json]"
+    )
+    print(
+        "Sends N requests (default 1000) with N in flight (default 16) per RPC.\n"
+        "GetEmbedding encodes menu names of data/menuitems-*.csv in FORMAT (text,\n"
+        "float32 or float16, default float32), NewRecommendations asks for N\n"
+        "synthetic users (default 200). Without a target the agent runs in this\n"
+        "process against an in-process fake of the kueater schema, every round\n"
+        "trip waiting MS milliseconds (default 0), and recommendation runs are\n"
+        "waited for after the RPCs returned."
+    )
+
+
+async def start_agent(db: FakeKueater) -> tuple[aio.Server, str]:
+    import server as agent
+    from rpc import MetricsInterceptor
+
+    install(db.pool(), "model")
+    server = aio.server(interceptors=[MetricsInterceptor()])
+    agent.add_KUEaterEmbeddingAgentServicer_to_server(
+        agent.AgentServiceImpl(), server=server
+    )
+    port = server.add_insecure_port("127.0.0.1:0")
+    # Same order as serve()
+    await agent.warm_up_service("in-process")
+    await server.start()
+    return server, f"127.0.0.1:{port}"
+
+
+async def load(call, requests: list, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors: Counter[str] = Counter()
+    queue = iter(requests)
+
+    async def client():
+        for request in queue:
+            start = time.perf_counter()
+            try:
+                await call(request)
+                latencies.append(time.perf_counter() - start)
+            except aio.AioRpcError as e:
+                errors[e.code().name] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return {**summarize(latencies, time.perf_counter() - start), "errors": dict(errors)}
+
+
+async def drain_scheduler(timeout: float = 600) -> dict:
+    # Waits until every accepted NewRecommendations has run
+    from model import RecommendationScheduler
+
+    scheduler = RecommendationScheduler.get()
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        stats = scheduler.stats()
+        if not stats["queue_depth"] and not stats["running"] and not stats["pending"]:
+            break
+        await asyncio.sleep(0.01)
+    return {"drain_seconds": time.perf_counter() - start, **scheduler.stats()}
+
+
+async def main(config: dict) -> dict:
+    from model.memory_repository import InMemoryRepository
+
+    data = InMemoryRepository.from_files(seed=config["seed"])
+    data.add_users(data.synthetic_users(config["users"], config["seed"]))
+    user_ids = list(data.users)
+    texts = [m.name for m in data.menus if m.name]
+    db = FakeKueater(data, latency=config["db_latency_ms"] / 1000)
+
+    server = None
+    target = config["target"]
+    if not target:
+        server, target = await start_agent(db)
+
+    n = config["requests"]
+    results = {}
+    try:
+        async with aio.insecure_channel(target) as channel:
+            stub = KUEaterEmbeddingAgentStub(channel)
+
+            if config["rpc"] in ("embedding", "all"):
+                fmt = FORMATS[config["format"]]
+                requests = [
+                    GetEmbeddingRequest(text=texts[i % len(texts)], format=fmt)
+                    for i in range(n)
+                ]
+                results["GetEmbedding"] = await load(
+                    stub.GetEmbedding, requests, config["concurrency"]
+                )
+                if server:
+                    from model import get_batcher, get_cache
+
+                    results["GetEmbedding"]["batcher"] = get_batcher().stats()
+                    results["GetEmbedding"]["cache"] = get_cache().stats()
+
+            if config["rpc"] in ("recommendations", "all"):
+                db.reset_counters()
+                requests = [
+                    NewRecommendationsRequest(user_id=user_ids[i % len(user_ids)])
+                    for i in range(n)
+                ]
+                results["NewRecommendations"] = await load(
+                    stub.NewRecommendations, requests, config["concurrency"]
+                )
+                if server:
+                    results["NewRecommendations"]["scheduler"] = await drain_scheduler()
+                    results["NewRecommendations"]["database"] = db.stats()
+                    results["NewRecommendations"]["users_written"] = len(
+                        db.menuitem_scores
+                    )
+    finally:
+        if server:
+            from model import RecommendationScheduler, close_process_pool
+
+            RecommendationScheduler.get().cancel()
+            close_process_pool()
+            await server.stop(None)
+
+    return results
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if "-h" in args or "--help" in args:
+        show_help()
+        sys.exit()
+
+    options = {
+        "--target": "",
+        "--rpc": "all",
+        "--requests": "1000",
+        "--concurrency": "16",
+        "--format": "float32",
+        "--users": "200",
+        "--db-latency": "0",
+        "--seed": "0",
+    }
+    for name in options:
+        if name in args:
+            idx = args.index(name)
+            try:
+                options[name] = args[idx + 1]
+            except IndexError:
+                show_help()
+                sys.exit(1)
+            del args[idx : idx + 2]
+
+    as_json = "--json" in args
+    try:
+        config = {
+            "target": options["--target"] or None,
+            "rpc": options["--rpc"],
+            "requests": int(options["--requests"]),
+            "concurrency": int(options["--concurrency"]),
+            "format": options["--format"],
+            "users": int(options["--users"]),
+            "db_latency_ms": float(options["--db-latency"]),
+            "seed": int(options["--seed"]),
+        }
+    except ValueError:
+        show_help()
+        sys.exit(1)
+    if (
+        config["rpc"] not in ("embedding", "recommendations", "all")
+        or config["format"] not in FORMATS
+    ):
+        show_help()
+        sys.exit(1)
+
+    # Peak RSS is the agent's too only when it runs in this process
+    report("grpc_load", config, asyncio.run(main(config)), as_json)
@@ -0,0 +1,185 @@
+# Recommendation generation one user at a time (NewRecommendations), as a batch
+# and as incremental events. Runs on the Postgres repository over the
+# in-process kueater fake, which counts database round trips, or on the
+# in-memory repository to time the pipeline without any database work.
+import asyncio
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+root_dir = Path(os.path.abspath(__file__)).parents[1]
+sys.path.append(str(root_dir))
+
+from benchmarks.common import report, summarize
+from benchmarks.fake_kueater import FakeKueater, install
+from src.model.batch import regenerate_recommendations
+from src.model.incremental import rescore_menuitems
+from src.model.memory_repository import InMemoryRepository
+from src.model.recommendations import generate_recommendations_for_user
+from src.model.repository import set_repository
+
+
+def show_help():
+    print(
+        "Usage: recommendations.py [--backend postgres|memory] [--users N]\n"
+        "                          [--concurrency N] [--db-latency MS]\n"
+        "                          [--pool-size N] [--seed N] [--json]"
+    )
+    print(
+        "Generates recommendations of N synthetic users (default 200) for the menu\n"
+        "items of data/menuitems-*.csv, one user at a time with N concurrent\n"
+        "requests (default 8), as one batch and as incremental like events.\n"
+        "The postgres backend (default) runs against an in-process fake of the\n"
+        "kueater schema, every round trip waiting MS milliseconds (default 0)."
+    )
+
+
+async def timed_runs(fn, items: list, concurrency: int) -> tuple[list[float], float]:
+    # Latency of every call and the wall time of all of them
+    slots = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def run(item):
+        async with slots:
+            start = time.perf_counter()
+            await fn(item)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(i) for i in items))
+    return latencies, time.perf_counter() - start
+
+
+def round_trips(db: FakeKueater | None, per: int) -> dict:
+    if db is None:
+        return {}
+    stats = db.stats()
+    stats["round_trips_per_user"] = stats["round_trips"] / per if per else 0.0
+    return stats
+
+
+def reset(db: FakeKueater | None, data: InMemoryRepository) -> None:
+    data.menuitem_scores.clear()
+    if db is not None:
+        db.reset_counters()
+
+
+async def main(
+    backend: str,
+    users: int,
+    concurrency: int,
+    db_latency: float,
+    pool_size: int,
+    seed: int,
+) -> dict:
+    data = InMemoryRepository.from_files(seed=seed)
+    data.add_users(data.synthetic_users(users, seed))
+    user_ids = list(data.users)
+    db = None
+    if backend == "postgres":
+        db = FakeKueater(data, latency=db_latency)
+        install(db.pool(pool_size))
+    else:
+        set_repository(data)
+    results = {}
+
+    # Catalog, ingredient scores and the scoring engine are loaded on first use
+    reset(db, data)
+    start = time.perf_counter()
+    await generate_recommendations_for_user(user_ids[0])
+    results["cold_start"] = {
+        "seconds": time.perf_counter() - start,
+        **round_trips(db, 1),
+    }
+
+    reset(db, data)
+    latencies, elapsed = await timed_runs(
+        generate_recommendations_for_user, user_ids, concurrency
+    )
+    results["single_user"] = {
+        **summarize(latencies, elapsed),
+        **round_trips(db, users),
+        # Runs swallow their errors, so check that every user got scores
+        "users_written": len(data.menuitem_scores),
+    }
+
+    reset(db, data)
+    start = time.perf_counter()
+    async for progress in regenerate_recommendations(user_ids):
+        pass
+    elapsed = time.perf_counter() - start
+    results["batch"] = {
+        "seconds": elapsed,
+        "users_per_second": progress.done / elapsed if elapsed else 0.0,
+        **round_trips(db, users),
+        "users_written": len(data.menuitem_scores),
+    }
+
+    # Events only update scores that exist, the batch above wrote them
+    rng = random.Random(seed)
+    menu_ids = [m.id for m in data.menus]
+    if db is not None:
+        db.reset_counters()
+    latencies, elapsed = await timed_runs(
+        lambda u: rescore_menuitems(u, [rng.choice(menu_ids)]), user_ids, concurrency
+    )
+    results["event"] = {**summarize(latencies, elapsed), **round_trips(db, users)}
+
+    return results
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if "-h" in args or "--help" in args:
+        show_help()
+        sys.exit()
+
+    options = {
+        "--backend": "postgres",
+        "--users": "200",
+        "--concurrency": "8",
+        "--db-latency": "0",
+        "--pool-size": "4",
+        "--seed": "0",
+    }
+    for name in options:
+        if name in args:
+            idx = args.index(name)
+            try:
+                options[name] = args[idx + 1]
+            except IndexError:
+                show_help()
+                sys.exit(1)
+            del args[idx : idx + 2]
+
+    as_json = "--json" in args
+    try:
+        config = {
+            "backend": options["--backend"],
+            "users": int(options["--users"]),
+            "concurrency": int(options["--concurrency"]),
+            "db_latency_ms": float(options["--db-latency"]),
+            "pool_size": int(options["--pool-size"]),
+            "seed": int(options["--seed"]),
+        }
+    except ValueError:
+        show_help()
+        sys.exit(1)
+    if config["backend"] not in ("postgres", "memory"):
+        show_help()
+        sys.exit(1)
+
+    results = asyncio.run(
+        main(
+            config["backend"],
+            config["users"],
+            config["concurrency"],
+            config["db_latency_ms"] / 1000,
+            config["pool_size"],
+            config["seed"],
+        )
+    )
+    report("recommendations", config, results, as_json)
@@ -0,0 +1,146 @@
+# Compares a model variant against fp32 on our menu names and common words, the
+# texts whose similarities drive favorite dish scores.
+import os
+import sys
+from json import dump
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+root_dir = Path(os.path.abspath(__file__)).parents[1]
+sys.path.append(str(root_dir))
+
+from src.model.scoring import FAVORITE_REASON_MIN, common_word_normalize
+from src.model.tensor_store import load_tensors
+from src.model.transformer import MODEL_VARIANTS, load_model
+
+
+def show_help():
+    print(
+        "Usage: check_model_variant.py [--variant VARIANT] [--min-cosine X] "
+        "[--json] [data_version]"
+    )
+    print(
+        "Encodes menu names of data/menuitems-[data_version].csv (the latest when\n"
+        "not given) and common words with fp32 and VARIANT (default int8), then\n"
+        "compares the embeddings and the common word x menu similarities.\n"
+        "Exits with 1 when the lowest embedding cosine is below X (default 0.98)."
+    )
+
+
+def menu_names(data_version: str | None) -> list[str]:
+    data_dir = root_dir.joinpath("data")
+    if data_version:
+        menuitem_file = data_dir.joinpath(f"menuitems-{data_version}.csv")
+    else:
+        menuitem_file = sorted(data_dir.glob("menuitems-*.csv"))[-1]
+    df = pd.read_csv(menuitem_file, encoding="utf-8", na_values=["–"]).fillna("")
+    # Same column database_populate_sql.py embeds
+    return list(dict.fromkeys(n for n in df.iloc[:, 3] if n))
+
+
+def common_words() -> list[str]:
+    return list(load_tensors(root_dir.joinpath("generated/tensors"), "common_words"))
+
+
+def encode(variant: str, texts: list[str]) -> np.ndarray:
+    model = load_model(variant)
+    return np.asarray(
+        model.encode(texts, batch_size=64, normalize_embeddings=True),
+        dtype=np.float64,
+    )
+
+
+def compare(
+    menus: list[str], words: list[str], reference: np.ndarray, other: np.ndarray
+) -> dict[str, float]:
+    # Rows are normalized, so dot products are cosine similarities
+    cosine = np.sum(reference * other, axis=1)
+
+    m = len(menus)
+    ref_sim = reference[m:] @ reference[:m].T
+    other_sim = other[m:] @ other[:m].T
+    sim_diff = np.abs(ref_sim - other_sim)
+
+    # Favorite dish points and whether the menu is a favorite reason
+    ref_points = common_word_normalize(ref_sim)
+    other_points = common_word_normalize(other_sim)
+    points_diff = np.abs(ref_points - other_points)
+    reason_flips = (ref_points >= FAVORITE_REASON_MIN) != (
+        other_points >= FAVORITE_REASON_MIN
+    )
+
+    # Same best menus for each common word
+    k = min(10, m)
+    ref_top = np.argsort(-ref_sim, axis=1)[:, :k]
+    other_top = np.argsort(-other_sim, axis=1)[:, :k]
+    top_overlap = np.mean(
+        [len(set(a) & set(b)) / k for a, b in zip(ref_top, other_top)]
+    )
+
+    return {
+        "texts": len(cosine),
+        "cosine_mean": float(cosine.mean()),
+        "cosine_min": float(cosine.min()),
+        "similarity_diff_mean": float(sim_diff.mean()),
+        "similarity_diff_max": float(sim_diff.max()),
+        "favorite_points_diff_mean": float(points_diff.mean()),
+        "favorite_points_diff_max": float(points_diff.max()),
+        "favorite_reason_flips": int(reason_flips.sum()),
+        f"top{k}_overlap": float(top_overlap),
+    }
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if "-h" in args or "--help" in args:
+        show_help()
+        sys.exit()
+
+    options = {"--variant": "int8", "--min-cosine": "0.98"}
+    for name in options:
+        if name in args:
+            idx = args.index(name)
+            try:
+                options[name] = args[idx + 1]
+            except IndexError:
+                show_help()
+                sys.exit(1)
+            del args[idx : idx + 2]
+
+    as_json = "--json" in args
+    if as_json:
+        args.remove("--json")
+
+    variant = options["--variant"]
+    if variant not in MODEL_VARIANTS or variant == "fp32":
+        show_help()
+        sys.exit(1)
+    try:
+        min_cosine = float(options["--min-cosine"])
+    except ValueError:
+        show_help()
+        sys.exit(1)
+
+    menus = menu_names(args[0] if args else None)
+    words = common_words()
+    texts = menus + words
+
+    result = compare(menus, words, encode("fp32", texts), encode(variant, texts))
+    result["variant"] = variant
+    result["passed"] = result["cosine_min"] >= min_cosine
+
+    if as_json:
+        dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"{len(menus)} menu names, {len(words)} common words, fp32 vs {variant}")
+        for key, value in result.items():
+            if isinstance(value, float):
+                print(f"  {key}: {value:.4f}")
+            else:
+                print(f"  {key}: {value}")
+
+    sys.exit(0 if result["passed"] else 1)
@@ -299,7 +299,11 @@ if __name__ == "__main__":
 
     print("== FINISHING UP ==")
 
-    parts = [_header, ingredient_sql, menuitem_sql, stall_sql]
+    parts = [
+        _header, ingredient_sql, menuitem_sql, stall_sql,
+        # Tell running agents to reload their menu catalog
+        "NOTIFY kueater_catalog;"
+    ]
 
     with open(
         generated_dir.joinpath(f"populate_{data_version}.sql"),
@@ -0,0 +1,21 @@
+# Writes the memory-mapped store (<name>.npy, <name>.keys.json) of every
+# generated/tensors/<name>.json, for tensors made before the store existed.
+import os
+import sys
+from json import load
+from pathlib import Path
+
+root_dir = Path(os.path.abspath(__file__)).parents[1]
+sys.path.append(str(root_dir))
+
+from src.model.tensor_store import save_tensors
+
+if __name__ == "__main__":
+    generated_dir = root_dir.joinpath("generated/tensors")
+
+    for file in sorted(generated_dir.glob("*.json")):
+        if file.name.endswith(".keys.json"):
+            continue
+        with open(file, mode="r") as f:
+            store = save_tensors(generated_dir, file.stem, load(f))
+        print(f"{file.stem}: {store.matrix.shape[0]} x {store.matrix.shape[1]}")
@@ -1,12 +1,13 @@
 import os
 import sys
 from pathlib import Path
-from json import load, dump
+from json import dump
 
 root_dir = Path(os.path.abspath(__file__)).parents[1]
 sys.path.append(str(root_dir))
 
 from src.model.encoder import encode_sync_tensor
+from src.model.tensor_store import load_tensors, save_tensors
 
 if __name__ == '__main__':
 
@@ -62,8 +63,7 @@ if __name__ == '__main__':
     common_words_tensors = {}
     if common_words_tensors_file.exists():
         try:
-            with open(common_words_tensors_file, mode="r") as f:
-                common_words_tensors = load(f)
+            common_words_tensors = load_tensors(generated_dir, 'common_words')
             if any(
                 (w not in common_words_tensors.keys()) for w in common_words
             ):
@@ -79,4 +79,8 @@ if __name__ == '__main__':
             common_words_tensors[word] = encode_sync_tensor(word).tolist()
         with open(common_words_tensors_file, mode="w") as f:
             dump(common_words_tensors, f)
-        print("Word tensors file saved")
\ No newline at end of file
+        print("Word tensors file saved")
+
+    # Memory-mapped copy the agent loads
+    save_tensors(generated_dir, 'common_words', common_words_tensors)
+    print("Word tensors store saved")
\ No newline at end of file
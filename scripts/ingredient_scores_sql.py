@@ -2,21 +2,25 @@ import os
 import sys
 import numpy as np
 from pathlib import Path
-from json import load, dump, loads
+from json import dump
 from typing import Callable
 from psycopg_pool import ConnectionPool
-from torch import tensor
 
 
 root_dir = Path(os.path.abspath(__file__)).parents[1]
 sys.path.append(str(root_dir))
 
-from src.model.encoder import similarity_sync, encode_sync_tensor
+from src.model.common_words import normalize_rows
+from src.model.tensor_store import TensorStore, load_tensors, save_tensors
+from src.model.transformer import Transformer
 
 # Query all embeddings that are ingredient
 
 query = "SELECT id, name FROM kueater.ingredient;"
 
+# Prompts encoded per model call
+BATCH_SIZE = 256
+
 def new_transaction(fn: Callable[..., str]):
     def wrapper(*args):
         result = fn(*args)
@@ -27,82 +31,78 @@ def new_transaction(fn: Callable[..., str]):
         COMMIT;"""
     return wrapper
 
+def fetch_ingredients(conn_pool: ConnectionPool) -> list[tuple]:
+    print("== FETCHING INGREDIENTS FROM DATABASE... ==")
+
+    with conn_pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query)
+            return cur.fetchall()
+
+def encode_texts(texts: list[str]) -> np.ndarray:
+    # Unit-length rows, one per text, encoded BATCH_SIZE at a time
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    vectors = Transformer.get().encode(
+        texts, batch_size=BATCH_SIZE, convert_to_numpy=True, show_progress_bar=False
+    )
+    return normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+def score_ingredients(names: list[str], prompt: str, tensors: TensorStore) -> np.ndarray:
+    # Cosine similarity of every "<name> <prompt>" to every tensor, ingredients
+    # x tensors. Same as similarity_sync of each pair
+    prompts = encode_texts([f"{name} {prompt}" for name in names])
+    if not len(prompts):
+        return np.zeros((0, len(tensors)), dtype=np.float32)
+    return prompts @ normalize_rows(np.asarray(tensors.matrix, dtype=np.float32)).T
+
+def generate_score_sql(
+    table: str, column: str, rows: list[tuple], tensors: TensorStore, scores: np.ndarray
+) -> str:
+    statements = []
+    for (uid, _), ingredient_scores in zip(rows, scores.tolist()):
+        for name, sim in zip(tensors.texts, ingredient_scores):
+            statements.append(f"('{uid}', '{name}', {sim})")
+    if not statements:
+        return ""
+    return (
+        f"INSERT INTO kueater.{table} (ingredient_id, {column}, score) VALUES\n"
+        + ",\n".join(statements)
+        + ";"
+    )
+
 @new_transaction
-def generate_diet_sql(conn_pool: ConnectionPool, diet_tensors: dict[str, list[float]]) -> str:
+def generate_diet_sql(rows: list[tuple], diet_tensors: TensorStore) -> str:
     
     print("== GENERATING DIET SCORES... ==")
     
     _header = """/*
     DIET SECTION
     */"""
-    
-    statements = [
+
+    scores = score_ingredients([name for _, name in rows], "compatible with", diet_tensors)
+    return "\n".join([
         _header,
-        "INSERT INTO kueater.ingredient_diet_score (ingredient_id, diet, score) VALUES"
-    ]
-    exec_rows = []
-    
-    print("== FETCHING INGREDIENTS FROM DATABASE... ==")
-    
-    with conn_pool.connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(query)
-            exec_rows = cur.fetchall()
-            
-    print("== SCORING, THIS MIGHT TAKE A WHILE... ==")
-
-    for idx, row in enumerate(exec_rows):    # for each ingredient
-        (uid, name) = row
-
-        # for each diet
-        for d, t in diet_tensors.items():
-            tensors = tensor(t)
-            sim = similarity_sync(encode_sync_tensor(f"{name} compatible with"), tensors)
-            if idx >= len(exec_rows) - 1:
-                statements.append(f"('{uid}', '{d}', {sim});")
-            else:
-                statements.append(f"('{uid}', '{d}', {sim}),")
-    
-    return "\n".join(statements)
+        generate_score_sql("ingredient_diet_score", "diet", rows, diet_tensors, scores)
+    ])
 
 
 @new_transaction
-def generate_allergen_sql(conn_pool: ConnectionPool, allergen_tensors: dict[str, list[float]]) -> str:
+def generate_allergen_sql(rows: list[tuple], allergen_tensors: TensorStore) -> str:
     
     print("== GENERATING ALLERGEN SCORES... ==")
     
     _header = """/*
     ALLERGEN SECTION
     */"""
-    
-    statements = [
+
+    scores = score_ingredients([name for _, name in rows], "has allergen", allergen_tensors)
+    return "\n".join([
         _header,
-        "INSERT INTO kueater.ingredient_allergen_score (ingredient_id, allergen, score) VALUES"
-    ]
-    exec_rows = []
-    
-    print("== FETCHING INGREDIENTS FROM DATABASE... ==")
-        
-    with conn_pool.connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(query)
-            exec_rows = cur.fetchall()
-            
-    print("== SCORING, THIS MIGHT TAKE A WHILE... ==")
-
-    for idx, row in enumerate(exec_rows):    # for each ingredient
-        (uid, name) = row
-
-        # for each diet
-        for a, t in allergen_tensors.items():
-            tensors = tensor(t)
-            sim = similarity_sync(encode_sync_tensor(f"{name} has allergen"), tensors)
-            if idx >= len(exec_rows) - 1:
-                statements.append(f"('{uid}', '{a}', {sim});")
-            else:
-                statements.append(f"('{uid}', '{a}', {sim}),")
-    
-    return "\n".join(statements)
+        generate_score_sql(
+            "ingredient_allergen_score", "allergen", rows, allergen_tensors, scores
+        )
+    ])
 
 if __name__ == '__main__':
     
@@ -140,8 +140,7 @@ if __name__ == '__main__':
     diets_tensors = {}
     if diets_tensors_file.exists():
         try:
-            with open(diets_tensors_file, mode="r") as f:
-                diets_tensors = load(f)
+            diets_tensors = load_tensors(generated_dir, 'diets')
             if any(
                 (d not in diets_tensors.keys()) for d in diets
             ):
@@ -153,18 +152,17 @@ if __name__ == '__main__':
         print("Diet tensors file not found, creating...")
     
     if not diets_tensors:
-        for diet in diets:
-            diets_tensors[diet] = encode_sync_tensor(diet).tolist()
+        diets_tensors = dict(zip(diets, Transformer.get().encode(diets).tolist()))
         with open(diets_tensors_file, mode="w") as f:
             dump(diets_tensors, f)
         print("Diet tensors file saved")
+    diets_tensors = save_tensors(generated_dir, 'diets', diets_tensors)
         
     # Allergen tensors loading
     allergens_tensors = {}
     if allergens_tensors_file.exists():
         try:
-            with open(allergens_tensors_file, mode="r") as f:
-                allergens_tensors = load(f)
+            allergens_tensors = load_tensors(generated_dir, 'allergen')
             if any(
                 (a not in allergens_tensors.keys()) for a in allergens
             ):
@@ -176,11 +174,11 @@ if __name__ == '__main__':
         print("Allergen tensors file not found, creating...")
     
     if not allergens_tensors:
-        for allergen in allergens:
-            allergens_tensors[allergen] = encode_sync_tensor(allergen).tolist()
+        allergens_tensors = dict(zip(allergens, Transformer.get().encode(allergens).tolist()))
         with open(allergens_tensors_file, mode="w") as f:
             dump(allergens_tensors, f)
         print("Allergen tensors file saved")
+    allergens_tensors = save_tensors(generated_dir, 'allergen', allergens_tensors)
 
     generated_dir = root_dir.joinpath('generated/sql')
     if not generated_dir.exists():
@@ -190,10 +188,15 @@ if __name__ == '__main__':
     KU Eater Ingredient Scoring for Diet and Allergen
     */"""
     
+    # Fetched once, every prompt is encoded once
+    ingredients = fetch_ingredients(conn_pool)
+
     parts = [
         _header,
-        generate_diet_sql(conn_pool, diets_tensors),
-        generate_allergen_sql(conn_pool, allergens_tensors)
+        generate_diet_sql(ingredients, diets_tensors),
+        generate_allergen_sql(ingredients, allergens_tensors),
+        # Tell running agents to drop their cached scores
+        "NOTIFY kueater_ingredient_scores;"
     ]
     
     print("== FINISHING UP ==")
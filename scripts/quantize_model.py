@@ -0,0 +1,58 @@
+# Makes the int8 variant of the ONNX model with dynamic quantization. It is
+# saved into the model directory next to the fp32 export and selected with
+# MODEL_VARIANT=int8.
+import os
+import sys
+from pathlib import Path
+
+root_dir = Path(os.path.abspath(__file__)).parents[1]
+sys.path.append(str(root_dir))
+
+from sentence_transformers import export_dynamic_quantized_onnx_model
+
+from src.model.transformer import MODEL_VARIANTS, get_model_path, load_model
+
+# Instruction sets ONNX Runtime can quantize for
+QUANTIZATION_CONFIGS = ["arm64", "avx2", "avx512", "avx512_vnni"]
+
+
+def show_help():
+    print("Usage: quantize_model.py [--config CONFIG]")
+    print(
+        "Quantizes the fp32 ONNX model in MODEL_PATH to int8, for the CPUs of\n"
+        f"CONFIG, one of {', '.join(QUANTIZATION_CONFIGS)} (default avx2).\n"
+        "Check the result with scripts/check_model_variant.py."
+    )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if "-h" in args or "--help" in args:
+        show_help()
+        sys.exit()
+
+    config = "avx2"
+    if "--config" in args:
+        idx = args.index("--config")
+        try:
+            config = args[idx + 1]
+        except IndexError:
+            show_help()
+            sys.exit(1)
+    if config not in QUANTIZATION_CONFIGS:
+        show_help()
+        sys.exit(1)
+
+    model_path = get_model_path()
+    model = load_model("fp32")
+
+    # Saved as onnx/model_{file_suffix}.onnx inside the model directory
+    file_name = MODEL_VARIANTS["int8"]
+    export_dynamic_quantized_onnx_model(
+        model,
+        quantization_config=config,
+        model_name_or_path=model_path,
+        file_suffix=Path(file_name).stem.removeprefix("model_"),
+    )
+    print(f"Saved {Path(model_path).joinpath(file_name)}")
@@ -0,0 +1,58 @@
+# Regenerates recommendations of every user, or of the given users, in one pass.
+import os
+import sys
+import asyncio
+from pathlib import Path
+
+import dotenv
+
+root_dir = Path(os.path.abspath(__file__)).parents[1]
+sys.path.append(str(root_dir))
+
+dotenv.load_dotenv()
+
+from src.model.batch import regenerate_recommendations
+
+
+def show_help():
+    print("Usage: regenerate_recommendations.py [--chunk-size N] [user_id ...]")
+    print(
+        "Regenerates recommendations of the given users, or of every user with\n"
+        "preferences when none are given. DATABASE_URL must be set."
+    )
+
+
+async def main(user_ids: list[str] | None, chunk_size: int):
+    async for progress in regenerate_recommendations(user_ids, chunk_size):
+        print(
+            f"{progress.done + progress.skipped}/{progress.total} users, "
+            f"{progress.skipped} skipped, {progress.elapsed:.1f}s "
+            f"({progress.users_per_second:.1f} users/s)"
+        )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if "-h" in args or "--help" in args:
+        show_help()
+        sys.exit()
+
+    chunk_size = 32
+    if "--chunk-size" in args:
+        idx = args.index("--chunk-size")
+        try:
+            chunk_size = int(args[idx + 1])
+        except (IndexError, ValueError):
+            show_help()
+            sys.exit(1)
+        del args[idx : idx + 2]
+
+    if not os.getenv("DATABASE_URL"):
+        print("DATABASE_URL is not specified in environment")
+        sys.exit(1)
+
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    asyncio.run(main(args or None, chunk_size))
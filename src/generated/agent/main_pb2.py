@@ -24,21 +24,37 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x10\x61gent/main.proto\x12\rkueater.agent\"#\n\x13GetEmbeddingRequest\x12\x0c\n\x04text\x18\x01 \x01(\t\"\'\n\x14GetEmbeddingResponse\x12\x0f\n\x07vectors\x18\x01 \x01(\t\",\n\x19NewRecommendationsRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\"\x1c\n\x1aNewRecommendationsResponse2\xdb\x01\n\x15KUEaterEmbeddingAgent\x12W\n\x0cGetEmbedding\x12\".kueater.agent.GetEmbeddingRequest\x1a#.kueater.agent.GetEmbeddingResponse\x12i\n\x12NewRecommendations\x12(.kueater.agent.NewRecommendationsRequest\x1a).kueater.agent.NewRecommendationsResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x10\x61gent/main.proto\x12\rkueater.agent\"P\n\x13GetEmbeddingRequest\x12\x0c\n\x04text\x18\x01 \x01(\t\x12+\n\x06\x66ormat\x18\x02 \x01(\x0e\x32\x1b.kueater.agent.VectorFormat\"x\n\x14GetEmbeddingResponse\x12\x0f\n\x07vectors\x18\x01 \x01(\t\x12\x0e\n\x06packed\x18\x02 \x01(\x0c\x12+\n\x06\x66ormat\x18\x03 \x01(\x0e\x32\x1b.kueater.agent.VectorFormat\x12\x12\n\ndimensions\x18\x04 \x01(\x05\"R\n\x14GetEmbeddingsRequest\x12\r\n\x05texts\x18\x01 \x03(\t\x12+\n\x06\x66ormat\x18\x02 \x01(\x0e\x32\x1b.kueater.agent.VectorFormat\"P\n\x15GetEmbeddingsResponse\x12\x37\n\nembeddings\x18\x01 \x03(\x0b\x32#.kueater.agent.GetEmbeddingResponse\",\n\x19NewRecommendationsRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\"\x1c\n\x1aNewRecommendationsResponse\"4\n RegenerateRecommendationsRequest\x12\x10\n\x08user_ids\x18\x01 \x03(\t\"\x84\x01\n!RegenerateRecommendationsProgress\x12\r\n\x05total\x18\x01 \x01(\x05\x12\x0c\n\x04\x64one\x18\x02 \x01(\x05\x12\x0f\n\x07skipped\x18\x03 \x01(\x05\x12\x17\n\x0f\x65lapsed_seconds\x18\x04 \x01(\x01\x12\x18\n\x10users_per_second\x18\x05 \x01(\x01\"v\n\x1aRecommendationEventRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x34\n\x04type\x18\x02 \x01(\x0e\x32&.kueater.agent.RecommendationEventType\x12\x11\n\tobject_id\x18\x03 \x01(\t\"C\n\x1bRecommendationEventResponse\x12\x13\n\x0bincremental\x18\x01 \x01(\x08\x12\x0f\n\x07updated\x18\x02 \x01(\x05*\\\n\x0cVectorFormat\x12\x16\n\x12VECTOR_FORMAT_TEXT\x10\x00\x12\x19\n\x15VECTOR_FORMAT_FLOAT32\x10\x01\x12\x19\n\x15VECTOR_FORMAT_FLOAT16\x10\x02*\xc5\x03\n\x17RecommendationEventType\x12$\n RECOMMENDATION_EVENT_PREFERENCES\x10\x00\x12#\n\x1fRECOMMENDATION_EVENT_MENU_LIKED\x10\x01\x12%\n!RECOMMENDATION_EVENT_MENU_UNLIKED\x10\x02\x12&\n\"RECOMMENDATION_EVENT_MENU_DISLIKED\x10\x03\x12(\n$RECOMMENDATION_EVENT_MENU_UNDISLIKED\x10\x04\x12#\n\x1fRECOMMENDATION_EVENT_MENU_SAVED\x10\x05\x12%\n!RECOMMENDATION_EVENT_MENU_UNSAVED\x10\x06\x12$\n RECOMMENDATION_EVENT_STALL_LIKED\x10\x07\x12&\n\"RECOMMENDATION_EVENT_STALL_UNLIKED\x10\x08\x12$\n RECOMMENDATION_EVENT_STALL_SAVED\x10\t\x12&\n\"RECOMMENDATION_EVENT_STALL_UNSAVED\x10\n2\x89\x05\n\x15KUEaterEmbeddingAgent\x12W\n\x0cGetEmbedding\x12\".kueater.agent.GetEmbeddingRequest\x1a#.kueater.agent.GetEmbeddingResponse\x12Z\n\rGetEmbeddings\x12#.kueater.agent.GetEmbeddingsRequest\x1a$.kueater.agent.GetEmbeddingsResponse\x12_\n\x10StreamEmbeddings\x12\".kueater.agent.GetEmbeddingRequest\x1a#.kueater.agent.GetEmbeddingResponse(\x01\x30\x01\x12i\n\x12NewRecommendations\x12(.kueater.agent.NewRecommendationsRequest\x1a).kueater.agent.NewRecommendationsResponse\x12\x80\x01\n\x19RegenerateRecommendations\x12/.kueater.agent.RegenerateRecommendationsRequest\x1a\x30.kueater.agent.RegenerateRecommendationsProgress0\x01\x12l\n\x13RecommendationEvent\x12).kueater.agent.RecommendationEventRequest\x1a*.kueater.agent.RecommendationEventResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'agent.main_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_VECTORFORMAT']._serialized_start=859
+  _globals['_VECTORFORMAT']._serialized_end=951
+  _globals['_RECOMMENDATIONEVENTTYPE']._serialized_start=954
+  _globals['_RECOMMENDATIONEVENTTYPE']._serialized_end=1407
   _globals['_GETEMBEDDINGREQUEST']._serialized_start=35
-  _globals['_GETEMBEDDINGREQUEST']._serialized_end=70
-  _globals['_GETEMBEDDINGRESPONSE']._serialized_start=72
-  _globals['_GETEMBEDDINGRESPONSE']._serialized_end=111
-  _globals['_NEWRECOMMENDATIONSREQUEST']._serialized_start=113
-  _globals['_NEWRECOMMENDATIONSREQUEST']._serialized_end=157
-  _globals['_NEWRECOMMENDATIONSRESPONSE']._serialized_start=159
-  _globals['_NEWRECOMMENDATIONSRESPONSE']._serialized_end=187
-  _globals['_KUEATEREMBEDDINGAGENT']._serialized_start=190
-  _globals['_KUEATEREMBEDDINGAGENT']._serialized_end=409
+  _globals['_GETEMBEDDINGREQUEST']._serialized_end=115
+  _globals['_GETEMBEDDINGRESPONSE']._serialized_start=117
+  _globals['_GETEMBEDDINGRESPONSE']._serialized_end=237
+  _globals['_GETEMBEDDINGSREQUEST']._serialized_start=239
+  _globals['_GETEMBEDDINGSREQUEST']._serialized_end=321
+  _globals['_GETEMBEDDINGSRESPONSE']._serialized_start=323
+  _globals['_GETEMBEDDINGSRESPONSE']._serialized_end=403
+  _globals['_NEWRECOMMENDATIONSREQUEST']._serialized_start=405
+  _globals['_NEWRECOMMENDATIONSREQUEST']._serialized_end=449
+  _globals['_NEWRECOMMENDATIONSRESPONSE']._serialized_start=451
+  _globals['_NEWRECOMMENDATIONSRESPONSE']._serialized_end=479
+  _globals['_REGENERATERECOMMENDATIONSREQUEST']._serialized_start=481
+  _globals['_REGENERATERECOMMENDATIONSREQUEST']._serialized_end=533
+  _globals['_REGENERATERECOMMENDATIONSPROGRESS']._serialized_start=536
+  _globals['_REGENERATERECOMMENDATIONSPROGRESS']._serialized_end=668
+  _globals['_RECOMMENDATIONEVENTREQUEST']._serialized_start=670
+  _globals['_RECOMMENDATIONEVENTREQUEST']._serialized_end=788
+  _globals['_RECOMMENDATIONEVENTRESPONSE']._serialized_start=790
+  _globals['_RECOMMENDATIONEVENTRESPONSE']._serialized_end=857
+  _globals['_KUEATEREMBEDDINGAGENT']._serialized_start=1410
+  _globals['_KUEATEREMBEDDINGAGENT']._serialized_end=2059
 # @@protoc_insertion_point(module_scope)
@@ -1,20 +1,78 @@
+from google.protobuf.internal import containers as _containers
+from google.protobuf.internal import enum_type_wrapper as _enum_type_wrapper
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import message as _message
-from typing import ClassVar as _ClassVar, Optional as _Optional
+from typing import ClassVar as _ClassVar, Iterable as _Iterable, Mapping as _Mapping, Optional as _Optional, Union as _Union
 
 DESCRIPTOR: _descriptor.FileDescriptor
 
+class VectorFormat(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+    __slots__ = ()
+    VECTOR_FORMAT_TEXT: _ClassVar[VectorFormat]
+    VECTOR_FORMAT_FLOAT32: _ClassVar[VectorFormat]
+    VECTOR_FORMAT_FLOAT16: _ClassVar[VectorFormat]
+
+class RecommendationEventType(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+    __slots__ = ()
+    RECOMMENDATION_EVENT_PREFERENCES: _ClassVar[RecommendationEventType]
+    RECOMMENDATION_EVENT_MENU_LIKED: _ClassVar[RecommendationEventType]
+    RECOMMENDATION_EVENT_MENU_UNLIKED: _ClassVar[RecommendationEventType]
+    RECOMMENDATION_EVENT_MENU_DISLIKED: _ClassVar[RecommendationEventType]
+    RECOMMENDATION_EVENT_MENU_UNDISLIKED: _ClassVar[RecommendationEventType]
+    RECOMMENDATION_EVENT_MENU_SAVED: _ClassVar[RecommendationEventType]
+    RECOMMENDATION_EVENT_MENU_UNSAVED: _ClassVar[RecommendationEventType]
+    RECOMMENDATION_EVENT_STALL_LIKED: _ClassVar[RecommendationEventType]
+    RECOMMENDATION_EVENT_STALL_UNLIKED: _ClassVar[RecommendationEventType]
+    RECOMMENDATION_EVENT_STALL_SAVED: _ClassVar[RecommendationEventType]
+    RECOMMENDATION_EVENT_STALL_UNSAVED: _ClassVar[RecommendationEventType]
+VECTOR_FORMAT_TEXT: VectorFormat
+VECTOR_FORMAT_FLOAT32: VectorFormat
+VECTOR_FORMAT_FLOAT16: VectorFormat
+RECOMMENDATION_EVENT_PREFERENCES: RecommendationEventType
+RECOMMENDATION_EVENT_MENU_LIKED: RecommendationEventType
+RECOMMENDATION_EVENT_MENU_UNLIKED: RecommendationEventType
+RECOMMENDATION_EVENT_MENU_DISLIKED: RecommendationEventType
+RECOMMENDATION_EVENT_MENU_UNDISLIKED: RecommendationEventType
+RECOMMENDATION_EVENT_MENU_SAVED: RecommendationEventType
+RECOMMENDATION_EVENT_MENU_UNSAVED: RecommendationEventType
+RECOMMENDATION_EVENT_STALL_LIKED: RecommendationEventType
+RECOMMENDATION_EVENT_STALL_UNLIKED: RecommendationEventType
+RECOMMENDATION_EVENT_STALL_SAVED: RecommendationEventType
+RECOMMENDATION_EVENT_STALL_UNSAVED: RecommendationEventType
+
 class GetEmbeddingRequest(_message.Message):
-    __slots__ = ("text",)
+    __slots__ = ("text", "format")
     TEXT_FIELD_NUMBER: _ClassVar[int]
+    FORMAT_FIELD_NUMBER: _ClassVar[int]
     text: str
-    def __init__(self, text: _Optional[str] = ...) -> None: ...
+    format: VectorFormat
+    def __init__(self, text: _Optional[str] = ..., format: _Optional[_Union[VectorFormat, str]] = ...) -> None: ...
 
 class GetEmbeddingResponse(_message.Message):
-    __slots__ = ("vectors",)
+    __slots__ = ("vectors", "packed", "format", "dimensions")
     VECTORS_FIELD_NUMBER: _ClassVar[int]
+    PACKED_FIELD_NUMBER: _ClassVar[int]
+    FORMAT_FIELD_NUMBER: _ClassVar[int]
+    DIMENSIONS_FIELD_NUMBER: _ClassVar[int]
     vectors: str
-    def __init__(self, vectors: _Optional[str] = ...) -> None: ...
+    packed: bytes
+    format: VectorFormat
+    dimensions: int
+    def __init__(self, vectors: _Optional[str] = ..., packed: _Optional[bytes] = ..., format: _Optional[_Union[VectorFormat, str]] = ..., dimensions: _Optional[int] = ...) -> None: ...
+
+class GetEmbeddingsRequest(_message.Message):
+    __slots__ = ("texts", "format")
+    TEXTS_FIELD_NUMBER: _ClassVar[int]
+    FORMAT_FIELD_NUMBER: _ClassVar[int]
+    texts: _containers.RepeatedScalarFieldContainer[str]
+    format: VectorFormat
+    def __init__(self, texts: _Optional[_Iterable[str]] = ..., format: _Optional[_Union[VectorFormat, str]] = ...) -> None: ...
+
+class GetEmbeddingsResponse(_message.Message):
+    __slots__ = ("embeddings",)
+    EMBEDDINGS_FIELD_NUMBER: _ClassVar[int]
+    embeddings: _containers.RepeatedCompositeFieldContainer[GetEmbeddingResponse]
+    def __init__(self, embeddings: _Optional[_Iterable[_Union[GetEmbeddingResponse, _Mapping]]] = ...) -> None: ...
 
 class NewRecommendationsRequest(_message.Message):
     __slots__ = ("user_id",)
@@ -25,3 +83,41 @@ class NewRecommendationsRequest(_message.Message):
 class NewRecommendationsResponse(_message.Message):
     __slots__ = ()
     def __init__(self) -> None: ...
+
+class RegenerateRecommendationsRequest(_message.Message):
+    __slots__ = ("user_ids",)
+    USER_IDS_FIELD_NUMBER: _ClassVar[int]
+    user_ids: _containers.RepeatedScalarFieldContainer[str]
+    def __init__(self, user_ids: _Optional[_Iterable[str]] = ...) -> None: ...
+
+class RegenerateRecommendationsProgress(_message.Message):
+    __slots__ = ("total", "done", "skipped", "elapsed_seconds", "users_per_second")
+    TOTAL_FIELD_NUMBER: _ClassVar[int]
+    DONE_FIELD_NUMBER: _ClassVar[int]
+    SKIPPED_FIELD_NUMBER: _ClassVar[int]
+    ELAPSED_SECONDS_FIELD_NUMBER: _ClassVar[int]
+    USERS_PER_SECOND_FIELD_NUMBER: _ClassVar[int]
+    total: int
+    done: int
+    skipped: int
+    elapsed_seconds: float
+    users_per_second: float
+    def __init__(self, total: _Optional[int] = ..., done: _Optional[int] = ..., skipped: _Optional[int] = ..., elapsed_seconds: _Optional[float] = ..., users_per_second: _Optional[float] = ...) -> None: ...
+
+class RecommendationEventRequest(_message.Message):
+    __slots__ = ("user_id", "type", "object_id")
+    USER_ID_FIELD_NUMBER: _ClassVar[int]
+    TYPE_FIELD_NUMBER: _ClassVar[int]
+    OBJECT_ID_FIELD_NUMBER: _ClassVar[int]
+    user_id: str
+    type: RecommendationEventType
+    object_id: str
+    def __init__(self, user_id: _Optional[str] = ..., type: _Optional[_Union[RecommendationEventType, str]] = ..., object_id: _Optional[str] = ...) -> None: ...
+
+class RecommendationEventResponse(_message.Message):
+    __slots__ = ("incremental", "updated")
+    INCREMENTAL_FIELD_NUMBER: _ClassVar[int]
+    UPDATED_FIELD_NUMBER: _ClassVar[int]
+    incremental: bool
+    updated: int
+    def __init__(self, incremental: bool = ..., updated: _Optional[int] = ...) -> None: ...
@@ -39,11 +39,31 @@ class KUEaterEmbeddingAgentStub(object):
                 request_serializer=agent_dot_main__pb2.GetEmbeddingRequest.SerializeToString,
                 response_deserializer=agent_dot_main__pb2.GetEmbeddingResponse.FromString,
                 _registered_method=True)
+        self.GetEmbeddings = channel.unary_unary(
+                '/kueater.agent.KUEaterEmbeddingAgent/GetEmbeddings',
+                request_serializer=agent_dot_main__pb2.GetEmbeddingsRequest.SerializeToString,
+                response_deserializer=agent_dot_main__pb2.GetEmbeddingsResponse.FromString,
+                _registered_method=True)
+        self.StreamEmbeddings = channel.stream_stream(
+                '/kueater.agent.KUEaterEmbeddingAgent/StreamEmbeddings',
+                request_serializer=agent_dot_main__pb2.GetEmbeddingRequest.SerializeToString,
+                response_deserializer=agent_dot_main__pb2.GetEmbeddingResponse.FromString,
+                _registered_method=True)
         self.NewRecommendations = channel.unary_unary(
                 '/kueater.agent.KUEaterEmbeddingAgent/NewRecommendations',
                 request_serializer=agent_dot_main__pb2.NewRecommendationsRequest.SerializeToString,
                 response_deserializer=agent_dot_main__pb2.NewRecommendationsResponse.FromString,
                 _registered_method=True)
+        self.RegenerateRecommendations = channel.unary_stream(
+                '/kueater.agent.KUEaterEmbeddingAgent/RegenerateRecommendations',
+                request_serializer=agent_dot_main__pb2.RegenerateRecommendationsRequest.SerializeToString,
+                response_deserializer=agent_dot_main__pb2.RegenerateRecommendationsProgress.FromString,
+                _registered_method=True)
+        self.RecommendationEvent = channel.unary_unary(
+                '/kueater.agent.KUEaterEmbeddingAgent/RecommendationEvent',
+                request_serializer=agent_dot_main__pb2.RecommendationEventRequest.SerializeToString,
+                response_deserializer=agent_dot_main__pb2.RecommendationEventResponse.FromString,
+                _registered_method=True)
 
 
 class KUEaterEmbeddingAgentServicer(object):
@@ -56,6 +76,20 @@ class KUEaterEmbeddingAgentServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetEmbeddings(self, request, context):
+        """Use for bulk embedding, vectors come back in the order of texts
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamEmbeddings(self, request_iterator, context):
+        """Use for bulk embedding over one stream, vectors come back in request order
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def NewRecommendations(self, request, context):
         """Use for recommendations
         """
@@ -63,6 +97,20 @@ class KUEaterEmbeddingAgentServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def RegenerateRecommendations(self, request, context):
+        """Regenerate recommendations of many (or all) users in one pass
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def RecommendationEvent(self, request, context):
+        """Update recommendations after one change of a user, send after it is saved
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_KUEaterEmbeddingAgentServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -71,11 +119,31 @@ def add_KUEaterEmbeddingAgentServicer_to_server(servicer, server):
                     request_deserializer=agent_dot_main__pb2.GetEmbeddingRequest.FromString,
                     response_serializer=agent_dot_main__pb2.GetEmbeddingResponse.SerializeToString,
             ),
+            'GetEmbeddings': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetEmbeddings,
+                    request_deserializer=agent_dot_main__pb2.GetEmbeddingsRequest.FromString,
+                    response_serializer=agent_dot_main__pb2.GetEmbeddingsResponse.SerializeToString,
+            ),
+            'StreamEmbeddings': grpc.stream_stream_rpc_method_handler(
+                    servicer.StreamEmbeddings,
+                    request_deserializer=agent_dot_main__pb2.GetEmbeddingRequest.FromString,
+                    response_serializer=agent_dot_main__pb2.GetEmbeddingResponse.SerializeToString,
+            ),
             'NewRecommendations': grpc.unary_unary_rpc_method_handler(
                     servicer.NewRecommendations,
                     request_deserializer=agent_dot_main__pb2.NewRecommendationsRequest.FromString,
                     response_serializer=agent_dot_main__pb2.NewRecommendationsResponse.SerializeToString,
             ),
+            'RegenerateRecommendations': grpc.unary_stream_rpc_method_handler(
+                    servicer.RegenerateRecommendations,
+                    request_deserializer=agent_dot_main__pb2.RegenerateRecommendationsRequest.FromString,
+                    response_serializer=agent_dot_main__pb2.RegenerateRecommendationsProgress.SerializeToString,
+            ),
+            'RecommendationEvent': grpc.unary_unary_rpc_method_handler(
+                    servicer.RecommendationEvent,
+                    request_deserializer=agent_dot_main__pb2.RecommendationEventRequest.FromString,
+                    response_serializer=agent_dot_main__pb2.RecommendationEventResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'kueater.agent.KUEaterEmbeddingAgent', rpc_method_handlers)
@@ -114,6 +182,60 @@ class KUEaterEmbeddingAgent(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def GetEmbeddings(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/kueater.agent.KUEaterEmbeddingAgent/GetEmbeddings',
+            agent_dot_main__pb2.GetEmbeddingsRequest.SerializeToString,
+            agent_dot_main__pb2.GetEmbeddingsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StreamEmbeddings(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/kueater.agent.KUEaterEmbeddingAgent/StreamEmbeddings',
+            agent_dot_main__pb2.GetEmbeddingRequest.SerializeToString,
+            agent_dot_main__pb2.GetEmbeddingResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def NewRecommendations(request,
             target,
@@ -140,3 +262,57 @@ class KUEaterEmbeddingAgent(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def RegenerateRecommendations(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/kueater.agent.KUEaterEmbeddingAgent/RegenerateRecommendations',
+            agent_dot_main__pb2.RegenerateRecommendationsRequest.SerializeToString,
+            agent_dot_main__pb2.RegenerateRecommendationsProgress.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def RecommendationEvent(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/kueater.agent.KUEaterEmbeddingAgent/RecommendationEvent',
+            agent_dot_main__pb2.RecommendationEventRequest.SerializeToString,
+            agent_dot_main__pb2.RecommendationEventResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
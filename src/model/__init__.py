@@ -1,2 +1,13 @@
-from .encoder import encode
-from .recommendations import generate_recommendations_for_user
\ No newline at end of file
+from .encoder import encode, encode_vector, encode_many, pack_vector, seed_cache, get_batcher, get_cache, get_executor, get_process_pool, warm_up, close_process_pool
+from .recommendations import generate_recommendations_for_user, preload_recommendation_data
+from .database import get_db_connection_pool
+from .repository import RecommendationRepository, PostgresRepository, get_repository, set_repository
+from .memory_repository import InMemoryRepository
+from .ingredient_scores import IngredientScoreCache, INGREDIENT_SCORES_CHANNEL
+from .catalog import MenuCatalogStore, CATALOG_CHANNEL
+from .notifications import listen
+from .scheduler import RecommendationScheduler, Priority, QueueFull
+from .batch import regenerate_recommendations, BatchProgress
+from .incremental import rescore_menuitems
+from .refresh import ScoreRefresher
+from .metrics import registry as metrics_registry, serve_metrics
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import time
+
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from .metrics import Stages
+from .refresh import ScoreRefresher
+from .repository import get_repository
+from .scheduler import RecommendationScheduler
+from .scoring import get_scoring_engine, get_top_k, keep_top
+
+logger = logging.getLogger("recommendations")
+
+
+@dataclass
+class BatchProgress:
+    total: int
+    done: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def users_per_second(self) -> float:
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+
+async def regenerate_recommendations(
+    user_ids: list[str] | None = None, chunk_size: int = 32
+) -> AsyncIterator[BatchProgress]:
+    # Regenerates recommendations of the given users, or everyone, in chunks.
+    # Catalog and scores are loaded once; each chunk fetches its users in one
+    # query, is scored in one call and written with one COPY. Chunks run on
+    # the scheduler's workers at BATCH priority, so interactive requests go
+    # first. Yields progress after every chunk.
+    started = time.monotonic()
+    stages = Stages("batch")
+    repository = get_repository()
+
+    async with repository.session() as session:
+        catalog = await session.catalog()
+        ingredient_scores, version = await session.ingredient_scores()
+        if user_ids is None:
+            user_ids = await session.all_user_ids()
+
+    engine = get_scoring_engine(catalog, ingredient_scores, version)
+    top_k = get_top_k()
+    stages.lap("reference")
+    progress = BatchProgress(total=len(user_ids))
+    logger.info(f"Start regenerating recommendations for {progress.total} users")
+
+    async def run_chunk(chunk: list[str]) -> int:
+        # Time spent queued is not part of any stage
+        stages.skip()
+        async with repository.session() as session:
+            contexts = await session.user_contexts(chunk)
+            stages.lap("preferences")
+            # Scoring a chunk is CPU-bound, keep the event loop free
+            results = await asyncio.to_thread(engine.score, contexts)
+            stages.lap("scoring")
+            await session.replace_scores(keep_top(results, top_k))
+        stages.lap("write")
+        return len(contexts)
+
+    scheduler = RecommendationScheduler.get()
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start : start + chunk_size]
+        done = await scheduler.run_batch(lambda: run_chunk(chunk))
+
+        progress.done += done
+        progress.skipped += len(chunk) - done
+        progress.elapsed = time.monotonic() - started
+        logger.info(
+            f"Regenerated {progress.done + progress.skipped}/{progress.total} users "
+            f"({progress.users_per_second:.1f} users/s)"
+        )
+        yield progress
+        stages.skip()
+
+    # One refresh for the whole batch
+    await ScoreRefresher.get().refresh()
+    stages.lap("refresh")
+
+    progress.elapsed = time.monotonic() - started
+    logger.info(
+        f"Completed recommendations regeneration for {progress.done} users "
+        f"in {progress.elapsed:.1f}s ({progress.users_per_second:.1f} users/s)"
+    )
+    yield progress
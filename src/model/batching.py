@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import numpy as np
+from concurrent.futures import Executor
+from typing import Callable
+
+from .metrics import (
+    encoder_batch_size,
+    encoder_inference_seconds,
+    encoder_queue_wait_seconds,
+)
+
+
+# Collects texts from concurrent callers for up to `max_wait` seconds or
+# `max_batch` texts, runs them through `fn` as one batch on `executor` (the
+# default executor if None) and hands every caller its own row back. Up to
+# `concurrency` batches run at once, the next batch keeps filling meanwhile.
+class MicroBatcher:
+    def __init__(
+        self,
+        fn: Callable[[list[str]], np.ndarray],
+        max_batch: int = 32,
+        max_wait: float = 0.005,
+        executor: Executor | None = None,
+        concurrency: int = 1,
+    ):
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self.executor = executor
+        self.concurrency = max(1, concurrency)
+        # Text, its caller's future, when it was submitted
+        self._queue: asyncio.Queue[tuple[str, asyncio.Future, float]] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._running: set[asyncio.Task] = set()
+        # Batch size: number of batches run with that size
+        self.batch_sizes: dict[int, int] = {}
+        self.items = 0
+
+    async def submit(self, text: str) -> np.ndarray:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list[tuple[str, asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except TimeoutError:
+                break
+        # Callers that gave up while waiting
+        return [item for item in batch if not item[1].done()]
+
+    async def _run(self) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            # Wait for a free worker first, so the batch grows while all are busy
+            await self._slots.acquire()
+            batch = await self._collect()
+            if not batch:
+                self._slots.release()
+                continue
+
+            size = len(batch)
+            self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+            self.items += size
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _dispatch(self, batch: list[tuple[str, asyncio.Future, float]]) -> None:
+        start = time.perf_counter()
+        for _, _, submitted in batch:
+            encoder_queue_wait_seconds.observe(start - submitted)
+        encoder_batch_size.observe(len(batch))
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.fn, [t for t, _, _ in batch]
+            )
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+            encoder_inference_seconds.observe(time.perf_counter() - start)
+
+        for (_, future, _), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    def stats(self) -> dict[str, int | float | dict[int, int]]:
+        batches = sum(self.batch_sizes.values())
+        return {
+            "batches": batches,
+            "items": self.items,
+            "mean_batch_size": self.items / batches if batches else 0.0,
+            "queued": self._queue.qsize(),
+            "running": len(self._running),
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+        }
@@ -0,0 +1,76 @@
+import unicodedata
+
+import numpy as np
+from collections import OrderedDict
+
+
+def normalize_text(text: str) -> str:
+    # Same tokens for the model, so the same embedding
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+
+# Bounded LRU of embeddings keyed on (model, normalized text). Bounded by entry
+# count and, optionally, by the bytes held in vectors.
+class EmbeddingCache:
+    def __init__(self, model: str, max_entries: int = 10000, max_bytes: int = 0):
+        self.model = model
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, str], np.ndarray] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, text: str) -> np.ndarray | None:
+        key = (self.model, normalize_text(text))
+        vector = self._entries.get(key)
+        if vector is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return vector
+
+    def put(self, text: str, vector: np.ndarray) -> None:
+        if not self.enabled:
+            return
+        key = (self.model, normalize_text(text))
+        # Shared between callers, nobody gets to modify it
+        vector = np.array(vector, dtype=np.float32)
+        vector.flags.writeable = False
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old.nbytes
+        self._entries[key] = vector
+        self.bytes += vector.nbytes
+
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes and self.bytes > self.max_bytes)
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def seed(self, vectors: dict[str, list[float]]) -> int:
+        for text, vector in vectors.items():
+            self.put(text, np.asarray(vector, dtype=np.float32))
+        return len(vectors)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
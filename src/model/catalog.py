@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import time
+
+import numpy as np
+from dataclasses import dataclass
+from functools import cached_property
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from .common_words import common_word_list, common_word_matrix, normalize_rows
+from .data_utils import extract_uuids
+from .env import get_env_number
+
+logger = logging.getLogger("recommendations")
+
+menuitems_sql = "SELECT * FROM kueater.get_all_menuitems_with_ingredients();"
+
+menuitem_details_sql = (
+    "SELECT m.id AS menu_id, m.cuisine, sm.stall_id "
+    "FROM kueater.menuitem m "
+    "LEFT JOIN kueater.stall_menu sm ON sm.menu_id = m.id;"
+)
+
+menuitem_embeddings_sql = (
+    "SELECT object_id, embedding::text AS embedding "
+    "FROM kueater.embeddings WHERE object_type = 'menuitem';"
+)
+
+# Fingerprint of everything a snapshot is built from, embeddings included, so
+# regenerated vectors are picked up even when the row count stays the same
+catalog_version_sql = (
+    "SELECT concat_ws(':', "
+    "(SELECT count(*) || '/' || md5(coalesce(string_agg("
+    "id::text || ',' || coalesce(cuisine, ''), ';' ORDER BY id), '')) "
+    "FROM kueater.menuitem), "
+    "(SELECT count(*) || '/' || md5(coalesce(string_agg("
+    "menu_id::text || ',' || ingredient_id::text, ';' "
+    "ORDER BY menu_id, ingredient_id), '')) FROM kueater.menu_ingredient), "
+    "(SELECT count(*) || '/' || md5(coalesce(string_agg("
+    "stall_id::text || ',' || menu_id::text, ';' "
+    "ORDER BY stall_id, menu_id), '')) FROM kueater.stall_menu), "
+    "(SELECT count(*) || '/' || md5(coalesce(string_agg("
+    "object_id::text || ',' || md5(embedding::text), ';' ORDER BY object_id), '')) "
+    "FROM kueater.embeddings WHERE object_type = 'menuitem')) AS version;"
+)
+
+# scripts/database_populate_sql.py notifies this channel after populating
+CATALOG_CHANNEL = "kueater_catalog"
+
+
+# Immutable, parsed copy of the menu catalog. Ingredients of menu `m` are
+# ingredient_ids[indices[indptr[m]:indptr[m + 1]]].
+@dataclass(frozen=True)
+class MenuCatalog:
+    version: str
+    menu_ids: list[str]
+    ingredient_ids: list[str]
+    indptr: np.ndarray
+    indices: np.ndarray
+    cuisines: list[str]
+    stall_ids: list[str | None]
+    # Unit-length menu name embeddings, one row per menu, zero if missing
+    embeddings: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.menu_ids)
+
+    def ingredients_of(self, menu: int) -> list[str]:
+        start, end = self.indptr[menu], self.indptr[menu + 1]
+        return [self.ingredient_ids[i] for i in self.indices[start:end]]
+
+    def menu_ingredients(self) -> list[list[str]]:
+        return [self.ingredients_of(m) for m in range(len(self.menu_ids))]
+
+    @cached_property
+    def common_word_similarity(self) -> np.ndarray:
+        # Cosine similarity, common words x menus. Same as 1 - (a <=> b) in pgvector
+        if not common_word_list:
+            return np.zeros((0, len(self.menu_ids)), dtype=np.float32)
+        return common_word_matrix @ self.embeddings.T
+
+
+async def load_catalog(conn: AsyncConnection, version: str) -> MenuCatalog:
+    async with conn.cursor(row_factory=dict_row) as cur:
+        menuitems = await (await cur.execute(menuitems_sql)).fetchall()
+        details = await (await cur.execute(menuitem_details_sql)).fetchall()
+        embeddings = await (await cur.execute(menuitem_embeddings_sql)).fetchall()
+
+    # A menu item belongs to one stall, keep the first one seen
+    cuisine_of: dict[str, str] = {}
+    stall_of: dict[str, str | None] = {}
+    for r in details:
+        menu = str(r["menu_id"])
+        cuisine_of.setdefault(menu, r["cuisine"] or "")
+        if stall_of.get(menu) is None:
+            stall_of[menu] = str(r["stall_id"]) if r["stall_id"] else None
+
+    menu_ids: list[str] = []
+    menu_ingredients: list[list[str]] = []
+    seen: set[str] = set()
+    for r in menuitems:
+        menu = str(r["menu_id"])
+        if menu in seen:
+            continue
+        seen.add(menu)
+        ingredients = r["ingredients"]
+        ingredients = (
+            [i["id"] for i in ingredients]
+            if isinstance(ingredients, list)
+            else extract_uuids(str(ingredients))
+        )
+        menu_ids.append(menu)
+        menu_ingredients.append([str(i) for i in ingredients if i])
+
+    # Parsed once into a contiguous matrix, rows follow menu_ids
+    menu_index = {m: i for i, m in enumerate(menu_ids)}
+    vectors: dict[int, np.ndarray] = {}
+    for r in embeddings:
+        i = menu_index.get(str(r["object_id"]))
+        if i is not None and r["embedding"]:
+            vectors[i] = np.fromstring(
+                r["embedding"].strip("[]"), sep=",", dtype=np.float32
+            )
+    dim = len(next(iter(vectors.values()))) if vectors else common_word_matrix.shape[1]
+    matrix = np.zeros((len(menu_ids), dim), dtype=np.float32)
+    for i, vector in vectors.items():
+        matrix[i] = vector
+
+    return new_catalog(
+        version,
+        menu_ids,
+        menu_ingredients,
+        [cuisine_of.get(m, "") for m in menu_ids],
+        [stall_of.get(m) for m in menu_ids],
+        matrix,
+    )
+
+
+def new_catalog(
+    version: str,
+    menu_ids: list[str],
+    menu_ingredients: list[list[str]],
+    cuisines: list[str],
+    stall_ids: list[str | None],
+    embeddings: np.ndarray,
+) -> MenuCatalog:
+    # Everything is listed per menu, in menu_ids order
+    ingredient_index: dict[str, int] = {}
+    indices: list[int] = []
+    indptr = [0]
+    for ingredients in menu_ingredients:
+        for ingredient in dict.fromkeys(ingredients):
+            indices.append(
+                ingredient_index.setdefault(ingredient, len(ingredient_index))
+            )
+        indptr.append(len(indices))
+
+    return MenuCatalog(
+        version=version,
+        menu_ids=menu_ids,
+        ingredient_ids=list(ingredient_index),
+        indptr=np.asarray(indptr, dtype=np.int64),
+        indices=np.asarray(indices, dtype=np.int32),
+        cuisines=cuisines,
+        stall_ids=stall_ids,
+        embeddings=normalize_rows(np.asarray(embeddings, dtype=np.float32)),
+    )
+
+
+# Holds the current MenuCatalog. A new snapshot is built on the side and
+# swapped in with a single assignment, so a run always sees one whole catalog.
+class MenuCatalogStore:
+    __instance = None
+
+    def __init__(self):
+        raise RuntimeError("Call get() instead")
+
+    @classmethod
+    def get(cls) -> "MenuCatalogStore":
+        if cls.__instance is None:
+            instance = cls.__new__(cls)
+            instance._snapshot = None
+            instance._lock = asyncio.Lock()
+            instance._changed = asyncio.Event()
+            instance.check_interval = get_env_number("CATALOG_CHECK_INTERVAL", 300)
+            instance._running = False
+            instance._checked_at = 0.0
+            instance.refreshes = 0
+            cls.__instance = instance
+        return cls.__instance
+
+    @property
+    def snapshot(self) -> MenuCatalog | None:
+        return self._snapshot
+
+    def invalidate(self) -> None:
+        self._changed.set()
+
+    async def current(self, conn: AsyncConnection) -> MenuCatalog:
+        # Without run() in the background, re-validate once the snapshot is old
+        snapshot = self._snapshot
+        if snapshot is None or (
+            not self._running
+            and time.monotonic() - self._checked_at > self.check_interval
+        ):
+            snapshot = await self.refresh(conn)
+        return snapshot
+
+    async def refresh(self, conn: AsyncConnection) -> MenuCatalog:
+        async with self._lock:
+            async with conn.cursor() as cur:
+                await cur.execute(catalog_version_sql)
+                (version,) = await cur.fetchone()
+
+            if self._snapshot is not None and self._snapshot.version == version:
+                self._checked_at = time.monotonic()
+                return self._snapshot
+
+            started = time.monotonic()
+            snapshot = await load_catalog(conn, version)
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+            self.refreshes += 1
+            logger.info(
+                f"Loaded catalog of {len(snapshot)} menu items "
+                f"in {time.monotonic() - started:.2f}s ({version})"
+            )
+            return snapshot
+
+    async def run(self, pool: AsyncConnectionPool) -> None:
+        # Keeps the snapshot up to date, on NOTIFY or every check interval
+        self._running = True
+        try:
+            await self._run(pool)
+        finally:
+            self._running = False
+
+    async def _run(self, pool: AsyncConnectionPool) -> None:
+        while True:
+            try:
+                async with pool.connection() as conn:
+                    await self.refresh(conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cannot refresh menu catalog: {e}")
+            try:
+                await asyncio.wait_for(self._changed.wait(), self.check_interval)
+            except TimeoutError:
+                pass
+            self._changed.clear()
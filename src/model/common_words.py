@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+from pathlib import Path
+
+from .tensor_store import TensorStore, load_tensors
+
+rootdir = Path(os.getcwd())
+common_words: TensorStore = load_tensors(
+    rootdir.joinpath("generated/tensors"), "common_words"
+)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    # Unit rows, all-zero rows (missing vectors) stay zero
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def is_normalized(matrix: np.ndarray) -> bool:
+    norms = np.linalg.norm(matrix, axis=1)
+    return bool(np.all(np.isclose(norms, 1.0, atol=1e-4) | (norms == 0)))
+
+
+common_word_list: list[str] = list(common_words)
+# Used as stored when already unit rows, so it stays memory-mapped
+common_word_matrix: np.ndarray = (
+    np.zeros((0, 0), dtype=np.float32)
+    if not common_words
+    else common_words.matrix
+    if is_normalized(common_words.matrix)
+    else normalize_rows(np.asarray(common_words.matrix, dtype=np.float32))
+)
@@ -0,0 +1,53 @@
+import os
+import logging
+
+from psycopg_pool import AsyncConnectionPool
+
+db = os.getenv("DATABASE_URL")
+
+logger = logging.getLogger("recommendations")
+
+
+class AsyncConnectionPoolSingleton:
+    __instance = None
+
+    __pool: AsyncConnectionPool
+
+    def __init__(self):
+        raise RuntimeError("Call get() instead")
+
+    @classmethod
+    def get(cls, conninfo: str, **kwargs) -> AsyncConnectionPool:
+        if not cls.__instance:
+            cls.__instance = cls.__new__(cls)
+            cls.__instance.__pool = AsyncConnectionPool(conninfo, **kwargs)
+        return cls.__instance.__pool
+
+
+def get_db_pool_options() -> dict[str, int]:
+    # Bounds the pool so recommendation workers cannot exhaust the database
+    options = {}
+    for key, env in (
+        ("min_size", "DATABASE_POOL_MIN_SIZE"),
+        ("max_size", "DATABASE_POOL_MAX_SIZE")
+    ):
+        value = os.getenv(env)
+        if not value:
+            continue
+        try:
+            options[key] = int(value)
+        except ValueError:
+            logger.error(f"{env} is not an integer, ignoring")
+    if "max_size" in options and "min_size" not in options:
+        options["min_size"] = min(4, options["max_size"])
+    return options
+
+def get_db_connection_pool():
+    if db:
+        try:
+            return AsyncConnectionPoolSingleton.get(db, open=True, **get_db_pool_options())
+        except Exception as e:
+            raise RuntimeError(f"Cannot connect to database: {e}")
+    else:
+        logger.error("DATABASE_URL is not specified in environment")
+    raise RuntimeError("Cannot connect to database")
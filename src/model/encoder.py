@@ -1,11 +1,159 @@
+import os
 import asyncio
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from torch import Tensor
-from .transformer import Transformer
+from .batching import MicroBatcher
+from .cache import EmbeddingCache, normalize_text
+from .env import get_env_number
+from .process_pool import InferenceProcessPool
+from .tensor_store import load_tensors, tensor_names
+from .transformer import Transformer, get_model_path, get_model_variant
+
+logger = logging.getLogger("encoder")
+
+_executor: ThreadPoolExecutor | None = None
+_pool: InferenceProcessPool | None = None
+_batcher: MicroBatcher | None = None
+_cache: EmbeddingCache | None = None
+_inflight: dict[str, asyncio.Task] = {}
+
+def get_inference_processes() -> int:
+    return max(0, int(get_env_number("INFERENCE_PROCESSES", 0)))
+
+def get_inference_workers() -> int:
+    # With worker processes, the threads only wait on them, one per process
+    return get_inference_processes() or max(1, int(get_env_number("INFERENCE_WORKERS", 1)))
+
+def get_process_pool() -> InferenceProcessPool | None:
+    # Only when INFERENCE_PROCESSES is set, the model runs in-process otherwise
+    global _pool
+    if _pool is None and get_inference_processes():
+        _pool = InferenceProcessPool(
+            get_inference_processes(),
+            timeout=get_env_number("INFERENCE_TIMEOUT", 30),
+            check_interval=get_env_number("INFERENCE_CHECK_INTERVAL", 10)
+        )
+    return _pool
+
+def close_process_pool() -> None:
+    if _pool is not None:
+        _pool.close()
+
+def get_executor() -> ThreadPoolExecutor:
+    # Inference threads, kept apart from the default executor. Each runs an
+    # ONNX session call which has its own intra-op threads (ORT_INTRA_OP_THREADS),
+    # so workers * intra-op threads should not exceed the cores available
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=get_inference_workers(), thread_name_prefix="inference"
+        )
+    return _executor
+
+def get_batcher() -> MicroBatcher:
+    # Concurrent encode() calls share forward passes
+    global _batcher
+    if _batcher is None:
+        pool = get_process_pool()
+        _batcher = MicroBatcher(
+            pool.encode if pool else lambda texts: Transformer.get().encode(texts),
+            max_batch=int(get_env_number("ENCODER_MAX_BATCH", 32)),
+            max_wait=get_env_number("ENCODER_MAX_WAIT_MS", 5) / 1000,
+            executor=get_executor(),
+            concurrency=get_inference_workers()
+        )
+    return _batcher
+
+def get_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache(
+            f"{get_model_path()}:{get_model_variant()}",
+            max_entries=int(get_env_number("EMBEDDING_CACHE_SIZE", 10000)),
+            max_bytes=int(get_env_number("EMBEDDING_CACHE_BYTES", 0))
+        )
+    return _cache
+
+def seed_cache() -> int:
+    # generated/tensors hold {text: vector} made with the fp32 model
+    if get_model_variant() != "fp32":
+        logger.info("Not seeding embedding cache, tensors are not from this variant")
+        return 0
+    cache = get_cache()
+    seeded = 0
+    directory = Path(os.getcwd()).joinpath("generated/tensors")
+    for name in tensor_names(directory):
+        try:
+            seeded += cache.seed(load_tensors(directory, name))
+        except Exception as e:
+            logger.error(f"Cannot seed embedding cache from {name}: {e}")
+    return seeded
+
+async def _encode_uncached(text: str):
+    try:
+        tensors = await get_batcher().submit(text)
+        get_cache().put(text, tensors)
+        return tensors
+    finally:
+        _inflight.pop(text, None)
+
+async def encode_vector(text: str) -> np.ndarray:
+    tensors = get_cache().get(text)
+    if tensors is None:
+        # Identical texts already being encoded share that result
+        text = normalize_text(text)
+        task = _inflight.get(text)
+        if task is None:
+            task = _inflight[text] = asyncio.create_task(_encode_uncached(text))
+        tensors = await asyncio.shield(task)
+    return tensors
+
+async def encode_many(texts: list[str]) -> list[np.ndarray]:
+    # A few batches at a time, so single encode() calls are not stuck behind
+    # a large request
+    window = get_batcher().max_batch * 4
+    vectors: list[np.ndarray] = []
+    for start in range(0, len(texts), window):
+        vectors.extend(await asyncio.gather(
+            *(encode_vector(t) for t in texts[start:start + window])
+        ))
+    return vectors
 
 async def encode(text: str) -> str:
-    transformer = Transformer.get()
-    tensors: Tensor = await asyncio.to_thread(transformer.encode, text)
-    return str(tensors.tolist())
+    return str((await encode_vector(text)).tolist())
+
+# Little-endian, so clients can np.frombuffer(packed, "<f4") on any platform
+PACKED_DTYPES = {"float32": "<f4", "float16": "<f2"}
+
+def pack_vector(vector: np.ndarray, dtype: str = "float32") -> bytes:
+    return np.asarray(vector, dtype=PACKED_DTYPES[dtype]).tobytes()
+
+# Menu names, preference words and longer descriptions, so the ONNX session
+# has seen the sequence lengths it will be asked for
+WARMUP_TEXTS = [
+    "rice",
+    "pad kra pao moo kai dao",
+    " ".join(["spicy stir fried minced pork with holy basil and fried egg"] * 4),
+    " ".join(["grilled chicken with sticky rice and papaya salad"] * 16)
+]
+
+def warm_up_model(transformer, rounds: int = 2) -> None:
+    # Runs the model over single and batched inputs
+    for _ in range(rounds):
+        for text in WARMUP_TEXTS:
+            transformer.encode(text)
+        transformer.encode(WARMUP_TEXTS)
+
+def warm_up() -> None:
+    # Loads the model, or starts the worker processes which warm up their own
+    pool = get_process_pool()
+    if pool:
+        pool.start()
+    else:
+        warm_up_model(Transformer.get())
 
 def encode_sync(text: str) -> str:
     transformer = Transformer.get()
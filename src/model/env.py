@@ -0,0 +1,15 @@
+import logging
+import os
+
+logger = logging.getLogger("config")
+
+
+def get_env_number(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.error(f"{name} is not a number, using {default}")
+        return default
@@ -0,0 +1,48 @@
+import logging
+
+from .metrics import Stages
+from .refresh import ScoreRefresher
+from .repository import get_repository
+from .scoring import get_scoring_engine
+
+logger = logging.getLogger("recommendations")
+
+
+# Likes, dislikes and saves only move the scores of the menu items they name
+# (see the scoring reference in recommendations.py), so those rows are rescored
+# and updated in place instead of regenerating every recommendation of the user.
+async def rescore_menuitems(user_id: str, menu_ids: list[str]) -> int | None:
+    # Rows updated, or None when the user has no scores of these menu items
+    # yet and needs a full generation
+    stages = Stages("event")
+    async with get_repository().session() as session:
+        contexts = await session.user_contexts([user_id])
+        stages.lap("preferences")
+        if not contexts:
+            logger.debug(f"User {user_id} does not exist or has no preferences")
+            return 0
+
+        catalog = await session.catalog()
+        ingredient_scores, version = await session.ingredient_scores()
+        engine = get_scoring_engine(catalog, ingredient_scores, version).restricted_to(
+            menu_ids
+        )
+        stages.lap("reference")
+        if not engine.menu_ids:
+            logger.debug(f"Menu items {menu_ids} are not in the catalog")
+            return 0
+
+        (result,) = engine.score(contexts)
+        stages.lap("scoring")
+        updated = await session.update_scores(result)
+        stages.lap("write")
+        # With RECOMMENDATION_TOP_K a menu item may not be stored, and a like
+        # could move it into the top K
+        if updated < len(result.menu_ids):
+            return None
+
+    await ScoreRefresher.get().refresh()
+    stages.lap("refresh")
+
+    logger.info(f"Rescored {updated} menu items for {user_id}")
+    return updated
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+
+from .env import get_env_number
+
+logger = logging.getLogger("recommendations")
+
+# Ingredient id: (Diet scores, Allergen scores)
+IngredientScores = dict[str, tuple[dict[str, float], dict[str, float]]]
+
+# Every ingredient with its diet and allergen scores, aggregated server-side
+# so the whole table comes back in a single round trip.
+ingredient_scores_sql = (
+    "SELECT i.id AS ingredient_id, d.diets, a.allergens "
+    "FROM kueater.ingredient i "
+    "LEFT JOIN (SELECT ingredient_id, json_object_agg(diet, score) AS diets "
+    "FROM kueater.ingredient_diet_score GROUP BY ingredient_id) d "
+    "ON d.ingredient_id = i.id "
+    "LEFT JOIN (SELECT ingredient_id, json_object_agg(allergen, score) AS allergens "
+    "FROM kueater.ingredient_allergen_score GROUP BY ingredient_id) a "
+    "ON a.ingredient_id = i.id;"
+)
+
+# Cheap fingerprint of the score tables, changes whenever scores are regenerated
+ingredient_scores_version_sql = (
+    "SELECT concat_ws(':', "
+    "(SELECT count(*) FROM kueater.ingredient), "
+    "(SELECT count(*) || '/' || coalesce(sum(score), 0) "
+    "FROM kueater.ingredient_diet_score), "
+    "(SELECT count(*) || '/' || coalesce(sum(score), 0) "
+    "FROM kueater.ingredient_allergen_score)) AS version;"
+)
+
+# scripts/ingredient_scores_sql.py notifies this channel after regenerating
+INGREDIENT_SCORES_CHANNEL = "kueater_ingredient_scores"
+
+
+async def fetch_ingredient_scores(conn: AsyncConnection) -> IngredientScores:
+    async with conn.cursor(row_factory=dict_row) as cur:
+        res = await (await cur.execute(ingredient_scores_sql)).fetchall()
+    return {
+        str(r["ingredient_id"]): (r["diets"] or {}, r["allergens"] or {}) for r in res
+    }
+
+
+# Process-wide copy of the ingredient score tables, shared by every run.
+# The copy is trusted for INGREDIENT_SCORES_CHECK_INTERVAL seconds, then the
+# table fingerprint is compared before it is used again. invalidate() (wired to
+# LISTEN/NOTIFY by the server) forces that check on the next access.
+class IngredientScoreCache:
+    __instance = None
+
+    def __init__(self):
+        raise RuntimeError("Call get() instead")
+
+    @classmethod
+    def get(cls) -> "IngredientScoreCache":
+        if cls.__instance is None:
+            instance = cls.__new__(cls)
+            instance._scores = None
+            instance._version = None
+            instance._checked_at = 0.0
+            instance._generation = 0
+            instance._lock = asyncio.Lock()
+            instance.check_interval = get_env_number(
+                "INGREDIENT_SCORES_CHECK_INTERVAL", 60
+            )
+            instance.hits = 0
+            instance.misses = 0
+            instance.invalidations = 0
+            cls.__instance = instance
+        return cls.__instance
+
+    def _fresh(self) -> bool:
+        return (
+            self._scores is not None
+            and time.monotonic() - self._checked_at < self.check_interval
+        )
+
+    @property
+    def version(self) -> str | None:
+        return self._version
+
+    def invalidate(self) -> None:
+        self._checked_at = 0.0
+        self._version = None
+        self._generation += 1
+        self.invalidations += 1
+        logger.info("Ingredient score cache invalidated")
+
+    def stats(self) -> dict[str, int | str | None]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "size": len(self._scores) if self._scores is not None else 0,
+            "version": self._version,
+        }
+
+    async def scores(self, conn: AsyncConnection) -> IngredientScores:
+        if self._fresh():
+            self.hits += 1
+            return self._scores
+
+        # Only one run re-validates, everyone else waits for its result
+        async with self._lock:
+            if self._fresh():
+                self.hits += 1
+                return self._scores
+
+            generation = self._generation
+
+            async with conn.cursor() as cur:
+                await cur.execute(ingredient_scores_version_sql)
+                (version,) = await cur.fetchone()
+
+            if self._scores is not None and version == self._version:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._scores = await fetch_ingredient_scores(conn)
+                self._version = version
+                logger.info(
+                    f"Loaded scores of {len(self._scores)} ingredients ({version})"
+                )
+
+            # Invalidated while fetching, check again on next access
+            self._checked_at = (
+                time.monotonic() if generation == self._generation else 0.0
+            )
+            return self._scores
@@ -0,0 +1,227 @@
+import os
+import random
+import uuid
+
+import numpy as np
+import pandas as pd
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Callable
+
+from .catalog import MenuCatalog, new_catalog
+from .common_words import common_word_list, common_word_matrix, normalize_rows
+from .ingredient_scores import IngredientScores
+from .repository import RecommendationRepository, RecommendationSession
+from .scoring import UserContext, UserScores
+from .tensor_store import load_tensors
+
+rootdir = Path(os.getcwd())
+
+# Ids are derived from the CSV keys, so every load gets the same ones
+NAMESPACE = uuid.UUID("6b1f3f0c-2f43-4b8e-9c55-5d3c8e0f7a21")
+
+
+def object_id(kind: str, key: str) -> str:
+    return str(uuid.uuid5(NAMESPACE, f"{kind}:{key}"))
+
+
+@dataclass
+class MenuRecord:
+    id: str
+    name: str
+    cuisine: str
+    stall_id: str
+    ingredient_ids: list[str]
+
+
+def read_menuitems(menuitem_file: Path) -> tuple[list[MenuRecord], dict[str, str]]:
+    # Menu items and {ingredient id: name}, from the same columns
+    # scripts/database_populate_sql.py reads
+    df = pd.read_csv(
+        menuitem_file, encoding="utf-8", dtype=str, na_values=["–"]
+    ).fillna("")
+    menus: list[MenuRecord] = []
+    ingredients: dict[str, str] = {}
+    for row in df.itertuples(index=False):
+        names = [n.strip() for column in (row[9], row[10]) for n in column.split(",")]
+        ingredient_ids = []
+        for name in dict.fromkeys(n for n in names if n):
+            ingredient = object_id("ingredient", name)
+            ingredients[ingredient] = name
+            ingredient_ids.append(ingredient)
+        menus.append(
+            MenuRecord(
+                id=object_id("menuitem", row[0]),
+                name=row[3],
+                cuisine=row[5],
+                stall_id=object_id("stall", row[1]),
+                ingredient_ids=ingredient_ids,
+            )
+        )
+    return menus, ingredients
+
+
+# Recommendation data held in memory, for benchmarks, replays and tests.
+# Written scores are kept per user in menuitem_scores.
+class InMemoryRepository(RecommendationRepository):
+    def __init__(
+        self,
+        menus: list[MenuRecord],
+        ingredients: dict[str, str],
+        ingredient_scores: IngredientScores,
+        embeddings: np.ndarray,
+        version: str = "memory",
+    ):
+        self.menus = menus
+        self.ingredients = ingredients
+        self.ingredient_scores = ingredient_scores
+        # Menu name embeddings, rows follow menus
+        self.embeddings = embeddings
+        self.version = version
+        self.catalog = new_catalog(
+            version,
+            [m.id for m in menus],
+            [m.ingredient_ids for m in menus],
+            [m.cuisine for m in menus],
+            [m.stall_id for m in menus],
+            embeddings,
+        )
+        self.users: dict[str, UserContext] = {}
+        # User id: {menu id: (score, reasoning)}
+        self.menuitem_scores: dict[str, dict[str, tuple[float, str]]] = {}
+        self.refreshes = 0
+
+    @classmethod
+    def from_files(
+        cls,
+        menuitem_file: Path | None = None,
+        encode: Callable[[list[str]], np.ndarray] | None = None,
+        seed: int = 0,
+    ) -> "InMemoryRepository":
+        # Menu items of data/menuitems-*.csv (the latest when not given), diets
+        # and allergens of generated/tensors. With `encode`, menu embeddings
+        # and ingredient scores are computed like the scripts compute them,
+        # otherwise they are drawn from `seed`, which costs the same to score.
+        if menuitem_file is None:
+            menuitem_file = sorted(rootdir.joinpath("data").glob("menuitems-*.csv"))[-1]
+        menus, ingredients = read_menuitems(menuitem_file)
+
+        tensors_dir = rootdir.joinpath("generated/tensors")
+        diets = load_tensors(tensors_dir, "diets")
+        allergens = load_tensors(tensors_dir, "allergen")
+        names = list(ingredients.values())
+
+        if encode is not None:
+            embeddings = np.asarray(encode([m.name for m in menus]), dtype=np.float32)
+            # Same prompts as scripts/ingredient_scores_sql.py
+            diet_scores = (
+                normalize_rows(
+                    np.asarray(encode([f"{n} compatible with" for n in names]))
+                )
+                @ normalize_rows(np.asarray(diets.matrix)).T
+            )
+            allergen_scores = (
+                normalize_rows(np.asarray(encode([f"{n} has allergen" for n in names])))
+                @ normalize_rows(np.asarray(allergens.matrix)).T
+            )
+            version = "memory-encoded"
+        else:
+            rng = np.random.default_rng(seed)
+            embeddings = rng.standard_normal(
+                (len(menus), common_word_matrix.shape[1]), dtype=np.float32
+            )
+            # Mostly suitable for a diet, mostly free of an allergen
+            diet_scores = rng.beta(5, 1.5, (len(names), len(diets)))
+            allergen_scores = rng.beta(1, 6, (len(names), len(allergens)))
+            version = f"memory-{seed}"
+
+        ingredient_scores = {
+            ingredient: (
+                dict(zip(diets.texts, diet_scores[i].tolist())),
+                dict(zip(allergens.texts, allergen_scores[i].tolist())),
+            )
+            for i, ingredient in enumerate(ingredients)
+        }
+        return cls(menus, ingredients, ingredient_scores, embeddings, version)
+
+    def add_users(self, users: list[UserContext]) -> None:
+        for user in users:
+            self.users[user.user_id] = user
+
+    def synthetic_users(self, count: int, seed: int = 0) -> list[UserContext]:
+        # Users with preferences of every shape, from none to many of each kind
+        rng = random.Random(seed)
+        menu_ids = [m.id for m in self.menus]
+        stall_ids = list(dict.fromkeys(m.stall_id for m in self.menus))
+        cuisines = sorted({c for m in self.menus for c in m.cuisine.split("/") if c})
+        ingredient_names = sorted(set(self.ingredients.values()))
+        diets = sorted({n for d, _ in self.ingredient_scores.values() for n in d})
+        allergens = sorted({n for _, a in self.ingredient_scores.values() for n in a})
+
+        def some(items: list[str], most: int) -> list[str]:
+            return rng.sample(items, rng.randint(0, min(most, len(items))))
+
+        return [
+            UserContext(
+                object_id("user", f"{seed}:{i}"),
+                diets=some(diets, 2),
+                allergies=some(allergens, 3),
+                cuisines=some(cuisines, 3),
+                disliked_ingredients=some(ingredient_names, 3),
+                favorite_dishes=some(common_word_list, 6),
+                liked_menus=some(menu_ids, 20),
+                disliked_menus=some(menu_ids, 10),
+                saved_menus=some(menu_ids, 10),
+                liked_stalls=some(stall_ids, 5),
+                saved_stalls=some(stall_ids, 5),
+            )
+            for i in range(count)
+        ]
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator["InMemorySession"]:
+        yield InMemorySession(self)
+
+
+class InMemorySession(RecommendationSession):
+    def __init__(self, repository: InMemoryRepository):
+        self.repository = repository
+
+    async def user_context(self, user_id: str) -> UserContext | None:
+        return self.repository.users.get(user_id)
+
+    async def user_contexts(self, user_ids: list[str]) -> list[UserContext]:
+        users = self.repository.users
+        return [users[u] for u in sorted(set(user_ids)) if u in users]
+
+    async def all_user_ids(self) -> list[str]:
+        return sorted(self.repository.users)
+
+    async def catalog(self) -> MenuCatalog:
+        return self.repository.catalog
+
+    async def ingredient_scores(self) -> tuple[IngredientScores, str | None]:
+        return self.repository.ingredient_scores, self.repository.version
+
+    async def replace_scores(self, results: list[UserScores]) -> int:
+        rows = 0
+        for result in results:
+            self.repository.menuitem_scores[result.user_id] = {
+                menu_id: (score, reasoning)
+                for _, menu_id, score, reasoning in result.rows()
+            }
+            rows += len(result.menu_ids)
+        return rows
+
+    async def update_scores(self, result: UserScores) -> int:
+        scores = self.repository.menuitem_scores.get(result.user_id, {})
+        updated = 0
+        for _, menu_id, score, reasoning in result.rows():
+            if menu_id in scores:
+                scores[menu_id] = (score, reasoning)
+                updated += 1
+        return updated
+
+    async def refresh_scores(self) -> None:
+        self.repository.refreshes += 1
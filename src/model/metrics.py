@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+logger = logging.getLogger("metrics")
+
+# Seconds, from a cache hit to a full regeneration
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _number(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Label values: per-bucket counts (not cumulative), sum
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * len(self.buckets), [0.0])
+            counts, total = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            total[0] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: (list(c), t[0]) for k, (c, t) in self._series.items()}
+        for values, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {total!r}")
+            lines.append(
+                f"{self.name}_count{_labels(self.labels, values)} {cumulative}"
+            )
+        return lines
+
+
+# Histograms plus `stats()` style callables whose numbers are exported as gauges
+class Registry:
+    def __init__(self):
+        self.histograms: list[Histogram] = []
+        self.collectors: dict[str, Callable[[], dict]] = {}
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        histogram = Histogram(*args, **kwargs)
+        self.histograms.append(histogram)
+        return histogram
+
+    def collect(self, prefix: str, stats: Callable[[], dict]) -> None:
+        self.collectors[prefix] = stats
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for histogram in self.histograms:
+            lines.extend(histogram.render())
+        for prefix, stats in self.collectors.items():
+            try:
+                values = stats()
+            except Exception as e:
+                logger.error(f"Cannot collect {prefix} metrics: {e}")
+                continue
+            for key, value in values.items():
+                # Only plain numbers, nested ones are in the histograms
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+recommendation_stage_seconds = registry.histogram(
+    "kueater_recommendation_stage_seconds",
+    "Time spent in each stage of generating recommendations",
+    labels=("run", "stage"),
+)
+encoder_queue_wait_seconds = registry.histogram(
+    "kueater_encoder_queue_wait_seconds",
+    "Time a text waited in the encoder micro-batcher before inference",
+)
+encoder_inference_seconds = registry.histogram(
+    "kueater_encoder_inference_seconds",
+    "Time of one batched forward pass",
+)
+encoder_batch_size = registry.histogram(
+    "kueater_encoder_batch_size",
+    "Texts per forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+recommendation_queue_wait_seconds = registry.histogram(
+    "kueater_recommendation_queue_wait_seconds",
+    "Time recommendation work waited in the scheduler queue, debounce included",
+    labels=("priority",),
+)
+rpc_duration_seconds = registry.histogram(
+    "kueater_rpc_duration_seconds",
+    "gRPC handler latency",
+    labels=("method", "code"),
+)
+
+
+# OpenTelemetry spans around stages when METRICS_OTEL is set and the API is
+# installed, the exporter is set up by the deployment (opentelemetry-instrument)
+_tracer = None
+if os.getenv("METRICS_OTEL"):
+    try:
+        from opentelemetry import trace
+
+        _tracer = trace.get_tracer("kueater.agent")
+    except ImportError:
+        logger.error("METRICS_OTEL is set but opentelemetry-api is not installed")
+
+
+# Times consecutive stages of one run, each lap() ends the stage that started
+# at the previous lap (or at creation) and starts the next one
+class Stages:
+    def __init__(self, run: str):
+        self.run = run
+        self.last = time.perf_counter()
+        self.last_ns = time.time_ns()
+
+    def lap(self, name: str) -> None:
+        now = time.perf_counter()
+        elapsed = now - self.last
+        recommendation_stage_seconds.observe(elapsed, self.run, name)
+        end_ns = self.last_ns + int(elapsed * 1e9)
+        if _tracer is not None:
+            _tracer.start_span(
+                f"recommendations.{self.run}.{name}", start_time=self.last_ns
+            ).end(end_time=end_ns)
+        self.last, self.last_ns = now, end_ns
+
+    def skip(self) -> None:
+        # Time since the last lap was not spent in this run
+        self.last = time.perf_counter()
+        self.last_ns = time.time_ns()
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request = await asyncio.wait_for(reader.readline(), 5)
+        # Headers are not needed
+        while await asyncio.wait_for(reader.readline(), 5) not in (
+            b"\r\n",
+            b"\n",
+            b"",
+        ):
+            pass
+        parts = request.decode("latin-1").split()
+        if (
+            len(parts) >= 2
+            and parts[0] == "GET"
+            and parts[1].split("?")[0] == "/metrics"
+        ):
+            status, body = "200 OK", registry.render().encode()
+        else:
+            status, body = "404 Not Found", b"Not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_metrics(port: int, host: str = "127.0.0.1") -> asyncio.Server:
+    # GET /metrics in the Prometheus text format
+    return await asyncio.start_server(_handle, host, port)
@@ -0,0 +1,36 @@
+import asyncio
+import logging
+
+from typing import Callable
+from psycopg import AsyncConnection
+from psycopg.sql import SQL, Identifier
+
+logger = logging.getLogger("recommendations")
+
+
+async def listen(
+    conninfo: str, handlers: dict[str, Callable[[], None]], retry: float = 5.0
+) -> None:
+    # Calls the handler of a channel whenever it gets a NOTIFY, reconnecting
+    # for as long as the task lives.
+    while True:
+        try:
+            conn = await AsyncConnection.connect(conninfo, autocommit=True)
+            async with conn:
+                for channel in handlers:
+                    await conn.execute(SQL("LISTEN {};").format(Identifier(channel)))
+                logger.info(f"Listening on {', '.join(handlers)}")
+
+                # Anything could have changed while we were not listening
+                for handler in handlers.values():
+                    handler()
+
+                async for notify in conn.notifies():
+                    handler = handlers.get(notify.channel)
+                    if handler:
+                        handler()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Notification listener error: {e}")
+        await asyncio.sleep(retry)
@@ -0,0 +1,222 @@
+import logging
+import multiprocessing as mp
+import queue
+import threading
+
+import numpy as np
+from multiprocessing.connection import Connection
+
+logger = logging.getLogger("encoder")
+
+
+# Raised in the worker by the model itself, the worker is still usable
+class InferenceError(RuntimeError):
+    pass
+
+
+def _serve(conn: Connection) -> None:
+    # Worker process: loads its own model, then answers (kind, payload) messages
+    # until it gets None or the front-end goes away
+    from .encoder import warm_up_model
+    from .transformer import Transformer
+
+    try:
+        model = Transformer.get()
+        warm_up_model(model)
+    except Exception as e:
+        conn.send(("error", repr(e)))
+        return
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        kind, payload = message
+        if kind == "ping":
+            conn.send(("pong", None))
+            continue
+        try:
+            conn.send(("ok", model.encode(payload)))
+        except Exception as e:
+            conn.send(("error", repr(e)))
+
+
+class _Worker:
+    def __init__(self, context, index: int):
+        self.index = index
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_serve, args=(child,), name=f"inference-{index}", daemon=True
+        )
+        self.process.start()
+        child.close()
+
+    def receive(self, timeout: float):
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"Inference worker {self.index} did not answer")
+        kind, payload = self.conn.recv()
+        if kind == "error":
+            raise InferenceError(payload)
+        return payload
+
+    def wait_ready(self, timeout: float) -> None:
+        self.receive(timeout)
+
+    def call(self, message: tuple, timeout: float):
+        self.conn.send(message)
+        return self.receive(timeout)
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (EOFError, OSError):
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+# Runs the model in `processes` worker processes, each with its own loaded
+# SentenceTransformer, so tokenization and post-processing are not bound by the
+# front-end's GIL. encode() is blocking and meant to be called from executor
+# threads, one per process. Workers are pinged every `check_interval` seconds;
+# ones that crash, hang past `timeout` or stop answering are replaced.
+class InferenceProcessPool:
+    def __init__(
+        self,
+        processes: int,
+        timeout: float = 30.0,
+        check_interval: float = 10.0,
+        start_timeout: float = 300.0,
+    ):
+        self.processes = max(1, processes)
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.start_timeout = start_timeout
+        # Spawned, forking a process with ONNX Runtime threads is not safe
+        self._context = mp.get_context("spawn")
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._missing: set[int] = set()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = threading.Event()
+        self.restarts = 0
+        self.failures = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            workers = [_Worker(self._context, i) for i in range(self.processes)]
+            try:
+                for worker in workers:
+                    worker.wait_ready(self.start_timeout)
+            except Exception:
+                for worker in workers:
+                    worker.stop()
+                raise
+            for worker in workers:
+                self._idle.put(worker)
+            self._started = True
+        threading.Thread(
+            target=self._check, name="inference-health", daemon=True
+        ).start()
+        logger.info(f"Started {self.processes} inference processes")
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        self.start()
+        # A batch that crashed a worker is tried once more on another
+        for attempt in range(2):
+            try:
+                worker = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise RuntimeError("No inference worker available")
+            try:
+                result = worker.call(("encode", texts), self.timeout)
+            except InferenceError:
+                self._idle.put(worker)
+                raise
+            except (EOFError, OSError, TimeoutError) as e:
+                logger.error(f"Inference worker {worker.index} failed: {e!r}")
+                with self._lock:
+                    self.failures += 1
+                threading.Thread(
+                    target=self._replace, args=(worker,), daemon=True
+                ).start()
+                if attempt:
+                    raise RuntimeError("Inference failed on two workers") from e
+                continue
+            self._idle.put(worker)
+            return result
+
+    def _replace(self, worker: _Worker) -> None:
+        worker.stop()
+        self._spawn(worker.index)
+
+    def _spawn(self, index: int) -> None:
+        if self._closed.is_set():
+            return
+        replacement = _Worker(self._context, index)
+        try:
+            replacement.wait_ready(self.start_timeout)
+        except Exception as e:
+            logger.error(f"Cannot restart inference worker {index}: {e!r}")
+            replacement.stop()
+            with self._lock:
+                self._missing.add(index)
+            return
+        with self._lock:
+            self._missing.discard(index)
+            self.restarts += 1
+        logger.info(f"Restarted inference worker {index}")
+        self._idle.put(replacement)
+
+    def _check(self) -> None:
+        while not self._closed.wait(self.check_interval):
+            with self._lock:
+                missing = list(self._missing)
+            for index in missing:
+                self._spawn(index)
+
+            # Only idle workers, busy ones are covered by the encode timeout
+            for _ in range(self._idle.qsize()):
+                try:
+                    worker = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if not worker.process.is_alive():
+                        raise EOFError("process exited")
+                    worker.call(("ping", None), min(5.0, self.timeout))
+                except Exception as e:
+                    logger.error(f"Inference worker {worker.index} unhealthy: {e!r}")
+                    with self._lock:
+                        self.failures += 1
+                    self._replace(worker)
+                    continue
+                self._idle.put(worker)
+
+    def close(self) -> None:
+        self._closed.set()
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            missing = len(self._missing)
+        return {
+            "processes": self.processes,
+            "idle": self._idle.qsize(),
+            "missing": missing,
+            "restarts": self.restarts,
+            "failures": self.failures,
+        }
@@ -0,0 +1,62 @@
+import asyncio
+
+from .env import get_env_number
+from .repository import get_repository
+
+
+# kueater.refresh_menuitem_scores() refreshes one materialized view for every
+# user, and PostgreSQL cannot refresh a materialized view for a subset of its
+# rows. So refreshes are coalesced instead: a run waits for the first refresh
+# that starts after its writes committed, and every run that finished while a
+# refresh was in flight shares the next one. RECOMMENDATION_REFRESH_DELAY_MS
+# holds a refresh back to gather more runs.
+class ScoreRefresher:
+    __instance = None
+
+    def __init__(self):
+        raise RuntimeError("Call get() instead")
+
+    @classmethod
+    def get(cls) -> "ScoreRefresher":
+        if cls.__instance is None:
+            instance = cls.__new__(cls)
+            instance.delay = get_env_number("RECOMMENDATION_REFRESH_DELAY_MS", 0) / 1000
+            instance._lock = asyncio.Lock()
+            # Refreshes started, and the number of the last one that succeeded
+            instance._started = 0
+            instance._done = 0
+            instance.requested = 0
+            instance.refreshes = 0
+            instance.failures = 0
+            cls.__instance = instance
+        return cls.__instance
+
+    async def refresh(self) -> None:
+        # Returns once scores written before the call are visible
+        self.requested += 1
+        ticket = self._started + 1
+        async with self._lock:
+            if self._done >= ticket:
+                return
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            self._started += 1
+            started = self._started
+            try:
+                async with get_repository().session() as session:
+                    await session.refresh_scores()
+            except Exception:
+                # The next waiter tries again
+                self.failures += 1
+                raise
+            self._done = started
+            self.refreshes += 1
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "delay_seconds": self.delay,
+            "requested": self.requested,
+            "refreshes": self.refreshes,
+            "coalesced": self.requested - self.refreshes - self.failures,
+            "failures": self.failures,
+        }
@@ -0,0 +1,177 @@
+import logging
+
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, AsyncIterator
+
+from psycopg import AsyncConnection
+from psycopg.sql import SQL, Identifier
+from psycopg_pool import AsyncConnectionPool
+
+from .catalog import MenuCatalog, MenuCatalogStore
+from .database import get_db_connection_pool
+from .ingredient_scores import IngredientScoreCache, IngredientScores
+from .scoring import UserContext, UserScores
+from .user_context import fetch_all_user_ids, fetch_user_contexts
+
+logger = logging.getLogger("recommendations")
+
+
+# Everything a recommendation run reads and writes. A session is one unit of
+# work (one pooled connection for Postgres) and belongs to a single run.
+class RecommendationSession(ABC):
+    @abstractmethod
+    async def user_context(self, user_id: str) -> UserContext | None:
+        # None when the user does not exist or has no preferences set
+        pass
+
+    @abstractmethod
+    async def user_contexts(self, user_ids: list[str]) -> list[UserContext]:
+        # Users that do not exist or have no preferences are left out
+        pass
+
+    @abstractmethod
+    async def all_user_ids(self) -> list[str]:
+        pass
+
+    @abstractmethod
+    async def catalog(self) -> MenuCatalog:
+        pass
+
+    @abstractmethod
+    async def ingredient_scores(self) -> tuple[IngredientScores, str | None]:
+        # The scores and their version
+        pass
+
+    @abstractmethod
+    async def replace_scores(self, results: list[UserScores]) -> int:
+        # Stales every score of these users and writes the new ones in one
+        # transaction, returns the rows written
+        pass
+
+    @abstractmethod
+    async def update_scores(self, result: UserScores) -> int:
+        # Overwrites the scores the user already has of these menu items,
+        # returns the rows updated
+        pass
+
+    @abstractmethod
+    async def refresh_scores(self) -> None:
+        # Makes written scores visible to readers
+        pass
+
+
+class RecommendationRepository(ABC):
+    @abstractmethod
+    def session(self) -> AsyncContextManager[RecommendationSession]:
+        pass
+
+
+menuitem_scores_copy_sql = SQL(
+    "COPY {table} (user_id, menu_id, score, reasoning) FROM STDIN"
+).format(table=Identifier("kueater", "menuitem_scores"))
+
+stale_menuitem_scores_sql = (
+    "SELECT kueater.stale_menuitem_scores_of(id) FROM unnest(%s::uuid[]) AS id;"
+)
+
+# Likes, dislikes and saves only move the scores of the menu items they name,
+# so those rows are updated in place
+update_menuitem_scores_sql = (
+    "UPDATE kueater.menuitem_scores AS s "
+    "SET score = v.score, reasoning = v.reasoning "
+    "FROM unnest(%s::uuid[], %s::float8[], %s::text[]) AS v(menu_id, score, reasoning) "
+    "WHERE s.user_id = %s AND s.menu_id = v.menu_id;"
+)
+
+refresh_menuitem_scores_sql = "SELECT kueater.refresh_menuitem_scores();"
+
+
+async def write_menuitem_scores(cur, results: list[UserScores]) -> int:
+    # Streams every row through a single COPY, values are never put into SQL text
+    rows = 0
+    async with cur.copy(menuitem_scores_copy_sql) as copy:
+        for result in results:
+            for row in result.rows():
+                await copy.write_row(row)
+                rows += 1
+    return rows
+
+
+class PostgresSession(RecommendationSession):
+    def __init__(self, conn: AsyncConnection):
+        self.conn = conn
+
+    async def user_context(self, user_id: str) -> UserContext | None:
+        # Existence checks, preferences and interactions in one round trip
+        contexts = await fetch_user_contexts(self.conn, [user_id])
+        return contexts[0] if contexts else None
+
+    async def user_contexts(self, user_ids: list[str]) -> list[UserContext]:
+        return await fetch_user_contexts(self.conn, user_ids)
+
+    async def all_user_ids(self) -> list[str]:
+        return await fetch_all_user_ids(self.conn)
+
+    async def catalog(self) -> MenuCatalog:
+        # Parsed menu catalog, kept up to date in the background
+        return await MenuCatalogStore.get().current(self.conn)
+
+    async def ingredient_scores(self) -> tuple[IngredientScores, str | None]:
+        # Scores of every ingredient, shared with every other run
+        score_cache = IngredientScoreCache.get()
+        scores = await score_cache.scores(self.conn)
+        logger.debug(score_cache.stats())
+        return scores, score_cache.version
+
+    async def replace_scores(self, results: list[UserScores]) -> int:
+        async with self.conn.cursor() as cur:
+            async with self.conn.transaction():
+                await cur.execute(
+                    stale_menuitem_scores_sql, ([r.user_id for r in results],)
+                )
+                return await write_menuitem_scores(cur, results)
+
+    async def update_scores(self, result: UserScores) -> int:
+        async with self.conn.transaction():
+            cur = await self.conn.execute(
+                update_menuitem_scores_sql,
+                (
+                    result.menu_ids,
+                    result.scores.tolist(),
+                    result.reasonings,
+                    result.user_id,
+                ),
+            )
+            return cur.rowcount
+
+    async def refresh_scores(self) -> None:
+        await self.conn.execute(refresh_menuitem_scores_sql)
+
+
+class PostgresRepository(RecommendationRepository):
+    def __init__(self, pool: AsyncConnectionPool):
+        self.pool = pool
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[PostgresSession]:
+        async with self.pool.connection() as conn:
+            yield PostgresSession(conn)
+
+
+_repository: RecommendationRepository | None = None
+
+
+def get_repository() -> RecommendationRepository:
+    # Postgres, unless another backend was set
+    global _repository
+    if _repository is None:
+        _repository = PostgresRepository(get_db_connection_pool())
+    return _repository
+
+
+def set_repository(repository: RecommendationRepository | None) -> None:
+    # e.g. an InMemoryRepository for benchmarks, replays and tests. None goes
+    # back to Postgres
+    global _repository
+    _repository = repository
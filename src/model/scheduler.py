@@ -0,0 +1,298 @@
+import asyncio
+import itertools
+import logging
+import time
+
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Awaitable, Callable
+
+from .env import get_env_number
+from .metrics import recommendation_queue_wait_seconds
+from .recommendations import generate_recommendations_for_user
+
+logger = logging.getLogger("recommendations")
+
+
+class Priority(IntEnum):
+    # Lower runs first
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+class QueueFull(Exception):
+    pass
+
+
+# Compared by identity, batch jobs are kept in a set
+@dataclass(eq=False)
+class Job:
+    user_id: str
+    priority: Priority
+    submitted_at: float = field(default_factory=time.monotonic)
+    # Seconds it waits before it can be picked up
+    debounce: float = 0.0
+    released: bool = False
+    taken: bool = False
+    # Set for batch work, which runs instead of a single user's recommendations
+    run: Callable[[], Awaitable[Any]] | None = None
+    done: asyncio.Future | None = None
+
+
+# Bounded, prioritized queue of recommendation runs served by a fixed pool of
+# workers. Requests are coalesced per user: a user has at most one job waiting
+# and at most one re-run queued behind a running job. A job waits for its
+# debounce before it can be picked up: RECOMMENDATION_DEBOUNCE_MS (none by
+# default) for requests someone waits on, RECOMMENDATION_EVENT_DEBOUNCE_MS for
+# events, so a burst of them is folded into one run. When
+# RECOMMENDATION_QUEUE_SIZE jobs are waiting, a batch job is shed to make room
+# for an interactive one, otherwise the request is rejected with QueueFull.
+# Other work runs on the same workers: run_interactive() ahead of batch work
+# and within the same queue limit, run_batch() only when no interactive job is
+# ready to run.
+class RecommendationScheduler:
+    __instance = None
+
+    def __init__(self):
+        raise RuntimeError("Call get() instead")
+
+    @classmethod
+    def get(cls) -> "RecommendationScheduler":
+        if cls.__instance is None:
+            instance = cls.__new__(cls)
+            instance.debounce = get_env_number("RECOMMENDATION_DEBOUNCE_MS", 0) / 1000
+            instance.event_debounce = (
+                get_env_number("RECOMMENDATION_EVENT_DEBOUNCE_MS", 500) / 1000
+            )
+            instance.workers = max(1, int(get_env_number("RECOMMENDATION_WORKERS", 4)))
+            instance.max_queue = max(
+                1, int(get_env_number("RECOMMENDATION_QUEUE_SIZE", 1000))
+            )
+            # Released (debounced) jobs, admission is bounded in submit()
+            instance._queue = asyncio.PriorityQueue()
+            instance._seq = itertools.count()
+            # Strong references, so tasks are not garbage-collected mid-flight
+            instance._worker_tasks = []
+            instance._waiting = {}
+            instance._running = set()
+            instance._pending = {}
+            # run_interactive() and run_batch() work queued or running, failed
+            # on cancel()
+            instance._calls = set()
+            instance.submitted = 0
+            instance.coalesced = 0
+            instance.rejected = 0
+            instance.shed = 0
+            instance.runs = 0
+            instance.interactive_runs = 0
+            instance.batch_runs = 0
+            cls.__instance = instance
+        return cls.__instance
+
+    def start(self) -> None:
+        if self._worker_tasks:
+            return
+        self._worker_tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    def cancel(self) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        self._worker_tasks = []
+        for job in self._calls:
+            job.taken = True
+            job.done.cancel()
+        self._calls.clear()
+
+    def submit(
+        self,
+        user_id: str,
+        priority: Priority = Priority.INTERACTIVE,
+        debounce: float | None = None,
+    ) -> None:
+        # `debounce` in seconds, RECOMMENDATION_DEBOUNCE_MS if None
+        self.start()
+        self.submitted += 1
+        if debounce is None:
+            debounce = self.debounce
+
+        # Already running, queue (at most) one re-run behind it
+        if user_id in self._running:
+            self.coalesced += 1
+            pending = self._pending.get(user_id, (priority, debounce))
+            self._pending[user_id] = (
+                min(priority, pending[0]),
+                min(debounce, pending[1]),
+            )
+            return
+
+        # Already waiting, its priority may only go up and its debounce down
+        job = self._waiting.get(user_id)
+        if job:
+            self.coalesced += 1
+            if priority < job.priority:
+                job.priority = priority
+                if job.released:
+                    self._push(job)
+            if not job.released and debounce < job.debounce:
+                job.debounce = debounce
+                self._schedule_release(job)
+            return
+
+        self._admit(priority)
+        self._add(Job(user_id, priority, debounce=debounce))
+
+    async def run_interactive(self, run: Callable[[], Awaitable[Any]]) -> Any:
+        # Runs `run()` on a worker at INTERACTIVE priority and returns its
+        # result. Not debounced or coalesced, but admitted like submit(), so
+        # bursts get the same backpressure.
+        self.start()
+        self._admit(Priority.INTERACTIVE)
+        return await self._call(run, Priority.INTERACTIVE)
+
+    async def run_batch(self, run: Callable[[], Awaitable[Any]]) -> Any:
+        # Runs `run()` on a worker at BATCH priority and returns its result.
+        # Not debounced, counted against the queue size or shed: callers
+        # await each piece of work before submitting the next one.
+        self.start()
+        return await self._call(run, Priority.BATCH)
+
+    async def _call(self, run: Callable[[], Awaitable[Any]], priority: Priority) -> Any:
+        job = Job(
+            priority.name.lower(),
+            priority,
+            released=True,
+            run=run,
+            done=asyncio.get_running_loop().create_future(),
+        )
+        self._calls.add(job)
+        self._push(job)
+        try:
+            return await job.done
+        except asyncio.CancelledError:
+            # Not started yet, drop it
+            job.taken = True
+            raise
+        finally:
+            self._calls.discard(job)
+
+    def _depth(self) -> int:
+        # Jobs waiting for a worker that count against the queue size
+        return len(self._waiting) + sum(
+            1
+            for job in self._calls
+            if job.priority == Priority.INTERACTIVE and not job.taken
+        )
+
+    def _admit(self, priority: Priority) -> None:
+        if self._depth() >= self.max_queue and not self._shed(priority):
+            self.rejected += 1
+            raise QueueFull(f"Recommendation queue is full ({self.max_queue} waiting)")
+
+    def _add(self, job: Job) -> None:
+        self._waiting[job.user_id] = job
+        self._schedule_release(job)
+
+    def _schedule_release(self, job: Job) -> None:
+        asyncio.get_running_loop().call_later(job.debounce, self._release, job)
+
+    def _shed(self, priority: Priority) -> bool:
+        # Drop the newest waiting job of a lower priority, if there is one
+        for job in reversed(self._waiting.values()):
+            if job.priority > priority and not job.taken:
+                job.taken = True
+                del self._waiting[job.user_id]
+                self.shed += 1
+                logger.warning(f"Shed queued recommendations for {job.user_id}")
+                return True
+        return False
+
+    def _release(self, job: Job) -> None:
+        # Released already if its debounce was shortened
+        if job.taken or job.released:
+            return
+        job.released = True
+        self._push(job)
+
+    def _push(self, job: Job) -> None:
+        self._queue.put_nowait((job.priority, next(self._seq), job))
+
+    async def _next(self) -> Job:
+        while True:
+            _, _, job = await self._queue.get()
+            # Stale entries of shed or re-prioritized jobs
+            if not job.taken:
+                job.taken = True
+                return job
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._next()
+            recommendation_queue_wait_seconds.observe(
+                time.monotonic() - job.submitted_at, job.priority.name.lower()
+            )
+            if job.run is not None:
+                await self._run_call(job)
+                continue
+
+            user_id = job.user_id
+            self._waiting.pop(user_id, None)
+            self._running.add(user_id)
+            self.runs += 1
+
+            try:
+                await generate_recommendations_for_user(user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(e)
+            finally:
+                self._running.discard(user_id)
+
+            # Re-runs are bounded by the number of workers, never rejected
+            pending = self._pending.pop(user_id, None)
+            if pending is not None:
+                priority, debounce = pending
+                self.coalesced -= 1
+                self._add(Job(user_id, priority, debounce=debounce))
+
+    async def _run_call(self, job: Job) -> None:
+        if job.priority == Priority.BATCH:
+            self.batch_runs += 1
+        else:
+            self.interactive_runs += 1
+        try:
+            result = await job.run()
+        except asyncio.CancelledError:
+            job.done.cancel()
+            raise
+        except Exception as e:
+            if not job.done.done():
+                job.done.set_exception(e)
+        else:
+            if not job.done.done():
+                job.done.set_result(result)
+
+    def scheduled(self, user_id: str) -> bool:
+        # Waiting or running, a run that starts later sees every change so far
+        return user_id in self._waiting or user_id in self._running
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "workers": self.workers,
+            "queue_depth": self._depth(),
+            "queue_limit": self.max_queue,
+            "running": len(self._running),
+            "pending": len(self._pending),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "shed": self.shed,
+            "runs": self.runs,
+            "interactive_runs": self.interactive_runs,
+            "batch_in_flight": sum(
+                1 for job in self._calls if job.priority == Priority.BATCH
+            ),
+            "batch_runs": self.batch_runs,
+        }
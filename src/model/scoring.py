@@ -0,0 +1,437 @@
+# Vectorized form of the rules in the scoring reference of recommendations.py.
+#
+# Per-diet and per-allergen facts about every menu item (lowest/highest
+# ingredient score, whether any ingredient crosses a threshold) do not depend
+# on the user, so they are reduced once over the menu x ingredient incidence
+# when the engine is built. Scoring a batch of users is then a handful of
+# (users x diets) @ (diets x menus) style products and masked reductions.
+import copy
+import logging
+import os
+
+import numpy as np
+
+from dataclasses import dataclass, field
+from random import choice
+from typing import Iterator
+
+from .catalog import MenuCatalog
+from .common_words import common_word_list
+from .ingredient_scores import IngredientScores
+
+logger = logging.getLogger("recommendations")
+
+EXCLUDED = -999
+
+DIET_INCOMPATIBLE = 0.4
+DIET_MAYBE = 0.7
+DIET_PENALIZED = 0.8
+
+ALLERGEN_CONTAINS = 0.7
+ALLERGEN_UNSURE = 0.5
+
+UNSUITABLE_PENALTY = 20
+DISLIKED_PENALTY = 10
+LIKED_BONUS = 10
+SAVED_BONUS = 5
+
+FAVORITE_REASON_MIN = 6
+GOOD_REASONS_MIN = 10
+
+
+def common_word_normalize(score):
+    return np.minimum(score * (15 / 0.9), 15)
+
+
+@dataclass
+class UserContext:
+    user_id: str
+    diets: list[str] = field(default_factory=list)
+    allergies: list[str] = field(default_factory=list)
+    cuisines: list[str] = field(default_factory=list)
+    disliked_ingredients: list[str] = field(default_factory=list)
+    favorite_dishes: list[str] = field(default_factory=list)
+    liked_menus: list[str] = field(default_factory=list)
+    disliked_menus: list[str] = field(default_factory=list)
+    saved_menus: list[str] = field(default_factory=list)
+    liked_stalls: list[str] = field(default_factory=list)
+    saved_stalls: list[str] = field(default_factory=list)
+
+
+@dataclass
+class UserScores:
+    user_id: str
+    menu_ids: list[str]
+    scores: np.ndarray
+    reasonings: list[str]
+    # Menu items excluded by a diet or an allergen (scored from EXCLUDED)
+    excluded: np.ndarray | None = None
+
+    def rows(self) -> Iterator[tuple[str, str, float, str]]:
+        for menu_id, score, reasoning in zip(
+            self.menu_ids, self.scores.tolist(), self.reasonings
+        ):
+            yield self.user_id, menu_id, score, reasoning
+
+    def top(self, k: int) -> "UserScores":
+        # The k best menu items plus every excluded one, so the app still
+        # knows what to hide. Best first, excluded ones last.
+        excluded = (
+            self.excluded
+            if self.excluded is not None
+            else np.zeros(len(self.menu_ids), dtype=bool)
+        )
+        order = np.argsort(-self.scores, kind="stable")
+        keep = np.concatenate([order[~excluded[order]][:k], order[excluded[order]]])
+        return UserScores(
+            self.user_id,
+            [self.menu_ids[i] for i in keep],
+            self.scores[keep],
+            [self.reasonings[i] for i in keep],
+            excluded[keep],
+        )
+
+
+def get_top_k() -> int:
+    # Menu items kept per user besides the excluded ones, 0 keeps every one
+    top_k = os.getenv("RECOMMENDATION_TOP_K")
+    if not top_k:
+        return 0
+    try:
+        return max(int(top_k), 0)
+    except ValueError:
+        logger.error("RECOMMENDATION_TOP_K is not a number, keeping every menu item")
+        return 0
+
+
+def keep_top(results: list[UserScores], k: int) -> list[UserScores]:
+    # Everything when k is 0
+    return [r.top(k) for r in results] if k > 0 else results
+
+
+def _segment_reduce(ufunc: np.ufunc, values: np.ndarray, indptr: np.ndarray, fill):
+    # Reduce the rows of every menu (indptr[m]:indptr[m + 1]) into one row,
+    # menus without ingredients get `fill`.
+    out = np.full((len(indptr) - 1, values.shape[1]), fill, dtype=values.dtype)
+    nonempty = np.diff(indptr) > 0
+    if values.shape[0] and values.shape[1]:
+        out[nonempty] = ufunc.reduceat(values, indptr[:-1][nonempty], axis=0)
+    return out
+
+
+def _reduce_selected(
+    ufunc: np.ufunc, mask: np.ndarray, table: np.ndarray, initial: float
+) -> np.ndarray:
+    # ufunc over the rows of `table` each user selected in `mask` (users x
+    # rows) and `initial`, users x columns. Only the selected rows are
+    # gathered, a user picks a few of them.
+    out = np.full((len(mask), table.shape[1]), initial, dtype=table.dtype)
+    users, rows = np.nonzero(mask)
+    if len(rows):
+        starts = np.flatnonzero(np.diff(users, prepend=-1))
+        reduced = ufunc.reduceat(table[rows], starts, axis=0)
+        out[users[starts]] = ufunc(reduced, initial)
+    return out
+
+
+def _score_matrix(
+    ingredient_index: dict[str, int], scores: list[dict[str, float]], names: list[str]
+) -> np.ndarray:
+    column = {name: i for i, name in enumerate(names)}
+    matrix = np.full((len(ingredient_index), len(names)), np.nan)
+    for row, scoreset in zip(ingredient_index.values(), scores):
+        for name, score in scoreset.items():
+            matrix[row, column[name]] = score
+    return matrix
+
+
+def _names(mask_row: np.ndarray, index: dict[str, int], wanted: list[str]) -> str:
+    # Keep the order the user listed them in
+    return ", ".join(
+        n for n in dict.fromkeys(wanted) if n in index and mask_row[index[n]]
+    )
+
+
+class ScoringEngine:
+    def __init__(
+        self,
+        menu_ids: list[str],
+        menu_ingredients: list[list[str]],
+        ingredient_scores: IngredientScores,
+        favorite_words: list[str] | None = None,
+        favorite_similarity: np.ndarray | None = None,
+    ):
+        self.menu_ids = [str(m) for m in menu_ids]
+        self.menu_index = {m: i for i, m in enumerate(self.menu_ids)}
+
+        self.diets = sorted(
+            {d for diets, _ in ingredient_scores.values() for d in diets}
+        )
+        self.allergens = sorted(
+            {a for _, allergens in ingredient_scores.values() for a in allergens}
+        )
+        self.diet_index = {d: i for i, d in enumerate(self.diets)}
+        self.allergen_index = {a: i for i, a in enumerate(self.allergens)}
+
+        # Ingredients without scores put no constraint on a menu item
+        ingredient_index = {i: n for n, i in enumerate(ingredient_scores)}
+        indices: list[int] = []
+        indptr = [0]
+        for ingredients in menu_ingredients:
+            indices.extend(
+                ingredient_index[i] for i in ingredients if i in ingredient_index
+            )
+            indptr.append(len(indices))
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+
+        diet_matrix = _score_matrix(
+            ingredient_index, [d for d, _ in ingredient_scores.values()], self.diets
+        )
+        allergen_matrix = _score_matrix(
+            ingredient_index, [a for _, a in ingredient_scores.values()], self.allergens
+        )
+
+        # NaN (no score for that diet/allergen) never crosses a threshold and
+        # is skipped by fmin/fmax.
+        with np.errstate(invalid="ignore"):
+            d = diet_matrix[self.indices]
+            self.menu_diet_min = np.fmin(
+                _segment_reduce(np.fmin, d, self.indptr, np.nan), 1.0
+            )
+            self.menu_diet_incompatible = _segment_reduce(
+                np.logical_or, d <= DIET_INCOMPATIBLE, self.indptr, False
+            )
+            self.menu_diet_maybe = _segment_reduce(
+                np.logical_or,
+                (d > DIET_INCOMPATIBLE) & (d <= DIET_MAYBE),
+                self.indptr,
+                False,
+            )
+
+            a = allergen_matrix[self.indices]
+            self.menu_allergen_max = np.fmax(
+                _segment_reduce(np.fmax, a, self.indptr, np.nan), 0.0
+            )
+            self.menu_allergen_contains = _segment_reduce(
+                np.logical_or, a >= ALLERGEN_CONTAINS, self.indptr, False
+            )
+            self.menu_allergen_unsure = _segment_reduce(
+                np.logical_or,
+                (a >= ALLERGEN_UNSURE) & (a < ALLERGEN_CONTAINS),
+                self.indptr,
+                False,
+            )
+
+        # Normalized favorite dish score, words x menus
+        self.favorite_words = list(favorite_words or [])
+        self.favorite_index = {w: i for i, w in enumerate(self.favorite_words)}
+        if favorite_similarity is None:
+            favorite_similarity = np.zeros((0, len(self.menu_ids)))
+        self.favorite_scores = common_word_normalize(
+            np.nan_to_num(np.asarray(favorite_similarity, dtype=np.float64), nan=0.0)
+        )
+        self._count_tables()
+
+    def _count_tables(self) -> None:
+        # Diets/allergens x menus, for counting with float32 products. Counts
+        # are small integers, exact in float32.
+        self.diet_incompatible_counts = self.menu_diet_incompatible.T.astype(np.float32)
+        self.diet_maybe_counts = self.menu_diet_maybe.T.astype(np.float32)
+        self.allergen_contains_counts = self.menu_allergen_contains.T.astype(np.float32)
+        self.allergen_unsure_counts = self.menu_allergen_unsure.T.astype(np.float32)
+
+    @classmethod
+    def from_catalog(
+        cls, catalog: MenuCatalog, ingredient_scores: IngredientScores
+    ) -> "ScoringEngine":
+        return cls(
+            catalog.menu_ids,
+            catalog.menu_ingredients(),
+            ingredient_scores,
+            common_word_list,
+            catalog.common_word_similarity,
+        )
+
+    def restricted_to(self, menu_ids: list[str]) -> "ScoringEngine":
+        # The same engine over only these menu items (unknown ones are left
+        # out), for rescoring a few of them. Likes, dislikes and saves of other
+        # menu items do not affect them.
+        columns = [
+            self.menu_index[m]
+            for m in dict.fromkeys(str(m) for m in menu_ids)
+            if m in self.menu_index
+        ]
+        engine = copy.copy(self)
+        engine.menu_ids = [self.menu_ids[c] for c in columns]
+        engine.menu_index = {m: i for i, m in enumerate(engine.menu_ids)}
+        for name in (
+            "menu_diet_min",
+            "menu_diet_incompatible",
+            "menu_diet_maybe",
+            "menu_allergen_max",
+            "menu_allergen_contains",
+            "menu_allergen_unsure",
+        ):
+            setattr(engine, name, getattr(self, name)[columns])
+        engine.favorite_scores = self.favorite_scores[:, columns]
+        engine._count_tables()
+        return engine
+
+    def _mask(self, values: list[list[str]], index: dict[str, int], size: int):
+        mask = np.zeros((len(values), size), dtype=bool)
+        for row, names in enumerate(values):
+            for name in names:
+                i = index.get(str(name))
+                if i is not None:
+                    mask[row, i] = True
+        return mask
+
+    def score(
+        self, users: list[UserContext], chunk_size: int = 256
+    ) -> list[UserScores]:
+        results: list[UserScores] = []
+        for start in range(0, len(users), chunk_size):
+            results.extend(self._score_chunk(users[start : start + chunk_size]))
+        return results
+
+    def _score_chunk(self, users: list[UserContext]) -> list[UserScores]:
+        n_menus = len(self.menu_ids)
+
+        diets = self._mask([u.diets for u in users], self.diet_index, len(self.diets))
+        allergies = self._mask(
+            [u.allergies for u in users], self.allergen_index, len(self.allergens)
+        )
+        words = self._mask(
+            [u.favorite_dishes for u in users],
+            self.favorite_index,
+            len(self.favorite_words),
+        )
+        liked = self._mask([u.liked_menus for u in users], self.menu_index, n_menus)
+        disliked = self._mask(
+            [u.disliked_menus for u in users], self.menu_index, n_menus
+        )
+        saved = self._mask([u.saved_menus for u in users], self.menu_index, n_menus)
+
+        # Diets, users x menus
+        diet_min = _reduce_selected(np.minimum, diets, self.menu_diet_min.T, 1.0)
+        diet_incompatible = diets.astype(np.float32) @ self.diet_incompatible_counts
+        diet_maybe = diets.astype(np.float32) @ self.diet_maybe_counts
+
+        scores = np.zeros((len(users), n_menus))
+        excluded = diet_min <= DIET_INCOMPATIBLE
+        scores = np.where(
+            diet_min <= DIET_INCOMPATIBLE,
+            EXCLUDED,
+            scores - UNSUITABLE_PENALTY * diet_maybe * (diet_min <= DIET_PENALIZED),
+        )
+
+        # Allergens, users x menus
+        allergen_max = _reduce_selected(
+            np.maximum, allergies, self.menu_allergen_max.T, 0.0
+        )
+        allergen_contains = allergies.astype(np.float32) @ self.allergen_contains_counts
+        allergen_unsure = allergies.astype(np.float32) @ self.allergen_unsure_counts
+
+        excluded |= allergen_max >= ALLERGEN_CONTAINS
+        scores = np.where(
+            allergen_max >= ALLERGEN_CONTAINS,
+            EXCLUDED,
+            scores
+            - UNSUITABLE_PENALTY * allergen_unsure * (allergen_max >= ALLERGEN_UNSURE),
+        )
+
+        # Dislikes, favorites, likes and saves only add up from here
+        scores -= DISLIKED_PENALTY * disliked
+        scores += words.astype(np.float64) @ self.favorite_scores
+        favorite_min = _reduce_selected(np.minimum, words, self.favorite_scores, np.inf)
+        favorite_reason = words.any(axis=1)[:, None] & (
+            favorite_min >= FAVORITE_REASON_MIN
+        )
+        scores += LIKED_BONUS * liked
+        scores += SAVED_BONUS * saved
+
+        # Reasoning is only built where it ends up being shown
+        good = scores >= GOOD_REASONS_MIN
+        warned = (
+            (diet_incompatible > 0)
+            | (diet_maybe > 0)
+            | (allergen_contains > 0)
+            | (allergen_unsure > 0)
+        )
+
+        results: list[UserScores] = []
+        for u, user in enumerate(users):
+            reasonings = [""] * n_menus
+            user_words = [
+                w
+                for w in dict.fromkeys(user.favorite_dishes)
+                if w in self.favorite_index
+            ]
+
+            for m in np.flatnonzero(good[u] & favorite_reason[u]):
+                reasonings[m] = f"Because you like {choice(user_words)}"
+
+            for m in np.flatnonzero(~good[u] & warned[u]):
+                warn_reasons: list[str] = []
+                if diet_incompatible[u, m]:
+                    warn_reasons.append(
+                        "Not compatible with your diet: "
+                        + _names(
+                            self.menu_diet_incompatible[m] & diets[u],
+                            self.diet_index,
+                            user.diets,
+                        )
+                    )
+                elif diet_maybe[u, m]:
+                    warn_reasons.append(
+                        "Maybe compatible with your diet: "
+                        + _names(
+                            self.menu_diet_maybe[m] & diets[u],
+                            self.diet_index,
+                            user.diets,
+                        )
+                    )
+                if allergen_contains[u, m]:
+                    warn_reasons.append(
+                        "Contains allergen: "
+                        + _names(
+                            self.menu_allergen_contains[m] & allergies[u],
+                            self.allergen_index,
+                            user.allergies,
+                        )
+                    )
+                elif allergen_unsure[u, m]:
+                    warn_reasons.append(
+                        "May contain traces of: "
+                        + _names(
+                            self.menu_allergen_unsure[m] & allergies[u],
+                            self.allergen_index,
+                            user.allergies,
+                        )
+                    )
+                reasonings[m] = r"\n".join(warn_reasons)
+
+            results.append(
+                UserScores(
+                    user.user_id, self.menu_ids, scores[u], reasonings, excluded[u]
+                )
+            )
+        return results
+
+
+# The engine only depends on the catalog and the ingredient scores, so the
+# last one built is reused until either of them changes.
+_engine: tuple[tuple[str, str | None], ScoringEngine] | None = None
+
+
+def get_scoring_engine(
+    catalog: MenuCatalog,
+    ingredient_scores: IngredientScores,
+    scores_version: str | None,
+) -> ScoringEngine:
+    global _engine
+    key = (catalog.version, scores_version)
+    if _engine is None or _engine[0] != key:
+        _engine = (key, ScoringEngine.from_catalog(catalog, ingredient_scores))
+    return _engine[1]
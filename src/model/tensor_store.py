@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+
+import numpy as np
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterator
+
+logger = logging.getLogger("encoder")
+
+# <name>.npy holds a float32 (texts x dimensions) matrix, <name>.keys.json the
+# text of every row. Loaded memory-mapped, so processes share the page cache
+# instead of each parsing <name>.json into lists of floats.
+
+
+def store_files(directory: Path, name: str) -> tuple[Path, Path, Path]:
+    return (
+        directory.joinpath(f"{name}.npy"),
+        directory.joinpath(f"{name}.keys.json"),
+        directory.joinpath(f"{name}.json"),
+    )
+
+
+# Read-only {text: vector} over the rows of a matrix
+class TensorStore(Mapping):
+    def __init__(self, keys: list[str], matrix: np.ndarray):
+        if len(keys) != len(matrix):
+            raise ValueError(f"{len(keys)} keys for {len(matrix)} vectors")
+        self.texts = keys
+        self.matrix = matrix
+        self.index = {k: i for i, k in enumerate(keys)}
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.matrix[self.index[key]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.texts)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @classmethod
+    def from_dict(cls, tensors: Mapping) -> "TensorStore":
+        keys = list(tensors)
+        if not keys:
+            return cls([], np.zeros((0, 0), dtype=np.float32))
+        return cls(keys, np.asarray([tensors[k] for k in keys], dtype=np.float32))
+
+
+def _write(path: Path, write) -> None:
+    # Readers never see a half-written file
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, mode="wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def save_tensors(directory: Path, name: str, tensors: Mapping) -> TensorStore:
+    store = TensorStore.from_dict(tensors)
+    npy_file, keys_file, _ = store_files(directory, name)
+    _write(npy_file, lambda f: np.save(f, store.matrix))
+    _write(
+        keys_file,
+        lambda f: f.write(json.dumps(store.texts, ensure_ascii=False).encode()),
+    )
+    return store
+
+
+def load_tensors(directory: Path, name: str, mmap: bool = True) -> TensorStore:
+    # The binary store when there is one, <name>.json otherwise. Scripts write
+    # both, so they hold the same vectors
+    npy_file, keys_file, json_file = store_files(directory, name)
+    if npy_file.exists() and keys_file.exists():
+        try:
+            with open(keys_file, mode="r", encoding="utf-8") as f:
+                keys = json.load(f)
+            matrix = np.load(npy_file, mmap_mode="r" if mmap else None)
+            return TensorStore(keys, matrix)
+        except Exception as e:
+            logger.error(f"Cannot load {npy_file}, reading {json_file}: {e}")
+
+    with open(json_file, mode="r", encoding="utf-8") as f:
+        return TensorStore.from_dict(json.load(f))
+
+
+def tensor_names(directory: Path) -> list[str]:
+    # Every store in the directory, binary or JSON
+    names = {p.name.removesuffix(".keys.json") for p in directory.glob("*.keys.json")}
+    names |= {
+        p.stem for p in directory.glob("*.json") if not p.name.endswith(".keys.json")
+    }
+    return sorted(names)
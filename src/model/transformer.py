@@ -1,4 +1,5 @@
 from os import getenv, getcwd
+from threading import Lock
 from os.path import sep
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
@@ -14,11 +15,91 @@ def get_model_path():
     
     return Path(getcwd()).joinpath(pth).resolve().__str__()
 
+# ONNX file of each variant inside the model directory, None lets
+# sentence-transformers pick the fp32 export. int8 is made by
+# scripts/quantize_model.py
+MODEL_VARIANTS = {
+    "fp32": None,
+    "int8": "onnx/model_qint8.onnx"
+}
+
+def get_model_variant() -> str:
+    variant = (getenv("MODEL_VARIANT") or "fp32").lower()
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f"MODEL_VARIANT must be one of {list(MODEL_VARIANTS)}")
+    return variant
+
+# ONNX Runtime options, unset ones keep the runtime's defaults
+ORT_EXECUTION_MODES = {
+    "sequential": "ORT_SEQUENTIAL",
+    "parallel": "ORT_PARALLEL"
+}
+
+ORT_GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL"
+}
+
+def get_session_options():
+    intra_op = getenv("ORT_INTRA_OP_THREADS")
+    inter_op = getenv("ORT_INTER_OP_THREADS")
+    execution_mode = getenv("ORT_EXECUTION_MODE")
+    optimization_level = getenv("ORT_GRAPH_OPTIMIZATION_LEVEL")
+    if not any((intra_op, inter_op, execution_mode, optimization_level)):
+        return None
+
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if intra_op:
+        options.intra_op_num_threads = int(intra_op)
+    if inter_op:
+        options.inter_op_num_threads = int(inter_op)
+    if execution_mode:
+        if execution_mode.lower() not in ORT_EXECUTION_MODES:
+            raise ValueError(f"ORT_EXECUTION_MODE must be one of {list(ORT_EXECUTION_MODES)}")
+        options.execution_mode = getattr(
+            ort.ExecutionMode, ORT_EXECUTION_MODES[execution_mode.lower()]
+        )
+    if optimization_level:
+        if optimization_level.lower() not in ORT_GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(
+                f"ORT_GRAPH_OPTIMIZATION_LEVEL must be one of {list(ORT_GRAPH_OPTIMIZATION_LEVELS)}"
+            )
+        options.graph_optimization_level = getattr(
+            ort.GraphOptimizationLevel,
+            ORT_GRAPH_OPTIMIZATION_LEVELS[optimization_level.lower()]
+        )
+    return options
+
+def load_model(variant: str | None = None) -> SentenceTransformer:
+    variant = variant or get_model_variant()
+    opts = {
+        "device": "cpu",
+        "backend": "onnx"
+    }
+
+    model_kwargs = {}
+    if MODEL_VARIANTS[variant]:
+        model_kwargs["file_name"] = MODEL_VARIANTS[variant]
+    session_options = get_session_options()
+    if session_options is not None:
+        model_kwargs["session_options"] = session_options
+    if model_kwargs:
+        opts["model_kwargs"] = model_kwargs
+
+    return SentenceTransformer(get_model_path(), **opts)
+
 class Transformer:
     
     __instance = None
     
     __transformer: SentenceTransformer
+
+    # Concurrent first callers must not build the model twice
+    __lock = Lock()
     
     def __init__(self):
         raise RuntimeError("Call get() instead")
@@ -26,15 +107,10 @@ class Transformer:
     @classmethod
     def get(cls) -> SentenceTransformer:
         if cls.__instance is None:
-            print("Instantiating transformer...")
-            cls.__instance = cls.__new__(cls)
-            
-            model_path = get_model_path()
-    
-            opts = {
-                "device": "cpu",
-                "backend": "onnx"
-            }
-            
-            cls.__instance.__transformer = SentenceTransformer(model_path, **opts)
+            with cls.__lock:
+                if cls.__instance is None:
+                    print(f"Instantiating transformer ({get_model_variant()})...")
+                    instance = cls.__new__(cls)
+                    instance.__transformer = load_model()
+                    cls.__instance = instance
         return cls.__instance.__transformer
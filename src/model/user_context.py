@@ -0,0 +1,68 @@
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+
+from .scoring import UserContext
+
+# Preferences, likes, dislikes and saves of a set of users, each aggregation
+# filtered by user id up front.
+user_contexts_sql = (
+    "SELECT DISTINCT ON (u.id) u.id AS user_id, "
+    "up.diets, up.allergies, up.cuisines, up.disliked_ingredients, up.favorite_dishes, "
+    "ARRAY(SELECT menu_id::text FROM kueater.liked_item "
+    "WHERE user_id = u.id) AS liked_menus, "
+    "ARRAY(SELECT menu_id::text FROM kueater.disliked_item "
+    "WHERE user_id = u.id) AS disliked_menus, "
+    "ARRAY(SELECT menu_id::text FROM kueater.saved_item "
+    "WHERE user_id = u.id) AS saved_menus, "
+    "ARRAY(SELECT stall_id::text FROM kueater.liked_stall "
+    "WHERE user_id = u.id) AS liked_stalls, "
+    "ARRAY(SELECT stall_id::text FROM kueater.saved_stall "
+    "WHERE user_id = u.id) AS saved_stalls "
+    "FROM kueater.userprofile u "
+    "JOIN kueater.user_profile_preferences upp ON upp.user_id = u.id "
+    "JOIN kueater.user_preferences up ON up.id = upp.preferences_id "
+    "WHERE u.id = ANY(%s::uuid[]) "
+    "ORDER BY u.id;"
+)
+
+# Users that can get recommendations, i.e. have preferences set
+all_user_ids_sql = (
+    "SELECT DISTINCT upp.user_id FROM kueater.user_profile_preferences upp "
+    "JOIN kueater.userprofile u ON u.id = upp.user_id ORDER BY upp.user_id;"
+)
+
+
+def user_context_from(row: dict) -> UserContext:
+    return UserContext(
+        str(row["user_id"]),
+        **{
+            k: list(row[k] or [])
+            for k in (
+                "diets",
+                "allergies",
+                "cuisines",
+                "disliked_ingredients",
+                "favorite_dishes",
+                "liked_menus",
+                "disliked_menus",
+                "saved_menus",
+                "liked_stalls",
+                "saved_stalls",
+            )
+        },
+    )
+
+
+async def fetch_user_contexts(
+    conn: AsyncConnection, user_ids: list[str]
+) -> list[UserContext]:
+    # Users that do not exist or have no preferences are left out
+    async with conn.cursor(row_factory=dict_row) as cur:
+        rows = await (await cur.execute(user_contexts_sql, (user_ids,))).fetchall()
+    return [user_context_from(r) for r in rows]
+
+
+async def fetch_all_user_ids(conn: AsyncConnection) -> list[str]:
+    async with conn.cursor() as cur:
+        rows = await (await cur.execute(all_user_ids_sql)).fetchall()
+    return [str(r[0]) for r in rows]
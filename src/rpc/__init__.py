@@ -1 +1,2 @@
-from .service import AgentService
\ No newline at end of file
+from .service import AgentService
+from .metrics import MetricsInterceptor
\ No newline at end of file
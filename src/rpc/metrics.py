@@ -0,0 +1,95 @@
+import time
+
+import grpc
+from grpc import aio
+
+from model.metrics import rpc_duration_seconds
+
+SERVICE_PREFIX = "/kueater.agent."
+
+
+def _observe(method: str, context: aio.ServicerContext, start: float, failed: bool):
+    code = context.code()
+    if code is None:
+        code = "UNKNOWN" if failed else "OK"
+    rpc_duration_seconds.observe(
+        time.perf_counter() - start, method, getattr(code, "name", str(code))
+    )
+
+
+# Latency of every agent RPC by method and status code, streaming ones until
+# the last response is sent
+class MetricsInterceptor(aio.ServerInterceptor):
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None or not handler_call_details.method.startswith(
+            SERVICE_PREFIX
+        ):
+            return handler
+        method = handler_call_details.method.rsplit("/", 1)[-1]
+        options = {
+            "request_deserializer": handler.request_deserializer,
+            "response_serializer": handler.response_serializer,
+        }
+
+        if handler.unary_unary:
+            inner = handler.unary_unary
+
+            async def unary_unary(request, context):
+                start = time.perf_counter()
+                try:
+                    response = await inner(request, context)
+                except BaseException:
+                    _observe(method, context, start, True)
+                    raise
+                _observe(method, context, start, False)
+                return response
+
+            return grpc.unary_unary_rpc_method_handler(unary_unary, **options)
+
+        if handler.unary_stream:
+            inner = handler.unary_stream
+
+            async def unary_stream(request, context):
+                start = time.perf_counter()
+                try:
+                    async for response in inner(request, context):
+                        yield response
+                except BaseException:
+                    _observe(method, context, start, True)
+                    raise
+                _observe(method, context, start, False)
+
+            return grpc.unary_stream_rpc_method_handler(unary_stream, **options)
+
+        if handler.stream_stream:
+            inner = handler.stream_stream
+
+            async def stream_stream(request_iterator, context):
+                start = time.perf_counter()
+                try:
+                    async for response in inner(request_iterator, context):
+                        yield response
+                except BaseException:
+                    _observe(method, context, start, True)
+                    raise
+                _observe(method, context, start, False)
+
+            return grpc.stream_stream_rpc_method_handler(stream_stream, **options)
+
+        if handler.stream_unary:
+            inner = handler.stream_unary
+
+            async def stream_unary(request_iterator, context):
+                start = time.perf_counter()
+                try:
+                    response = await inner(request_iterator, context)
+                except BaseException:
+                    _observe(method, context, start, True)
+                    raise
+                _observe(method, context, start, False)
+                return response
+
+            return grpc.stream_unary_rpc_method_handler(stream_unary, **options)
+
+        return handler
@@ -4,8 +4,12 @@ from grpc import aio
 from generated.agent.main_pb2_grpc import KUEaterEmbeddingAgentServicer
 from generated.agent.main_pb2 import (
     GetEmbeddingRequest, GetEmbeddingResponse,
-    NewRecommendationsRequest, NewRecommendationsResponse
+    GetEmbeddingsRequest, GetEmbeddingsResponse,
+    NewRecommendationsRequest, NewRecommendationsResponse,
+    RegenerateRecommendationsRequest, RegenerateRecommendationsProgress,
+    RecommendationEventRequest, RecommendationEventResponse
 )
+from typing import AsyncIterator
 
 
 class AgentService(ABC, KUEaterEmbeddingAgentServicer):
@@ -18,6 +22,22 @@ class AgentService(ABC, KUEaterEmbeddingAgentServicer):
     ) -> GetEmbeddingResponse:
         pass
     
+    @abstractmethod
+    async def GetEmbeddings(
+        self,
+        request: GetEmbeddingsRequest,
+        context: aio.ServicerContext
+    ) -> GetEmbeddingsResponse:
+        pass
+
+    @abstractmethod
+    def StreamEmbeddings(
+        self,
+        request_iterator: AsyncIterator[GetEmbeddingRequest],
+        context: aio.ServicerContext
+    ) -> AsyncIterator[GetEmbeddingResponse]:
+        pass
+
     @abstractmethod
     async def NewRecommendations(
         self,
@@ -25,3 +45,19 @@ class AgentService(ABC, KUEaterEmbeddingAgentServicer):
         context: aio.ServicerContext
     ) -> NewRecommendationsResponse:
         pass
+
+    @abstractmethod
+    def RegenerateRecommendations(
+        self,
+        request: RegenerateRecommendationsRequest,
+        context: aio.ServicerContext
+    ) -> AsyncIterator[RegenerateRecommendationsProgress]:
+        pass
+
+    @abstractmethod
+    async def RecommendationEvent(
+        self,
+        request: RecommendationEventRequest,
+        context: aio.ServicerContext
+    ) -> RecommendationEventResponse:
+        pass
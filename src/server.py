@@ -2,20 +2,66 @@ import asyncio
 import sys
 
 from os import getenv
+from time import perf_counter
 from grpc import StatusCode
 from grpc import aio
+from grpc_health.v1 import health, health_pb2, health_pb2_grpc
 from generated.agent.main_pb2_grpc import add_KUEaterEmbeddingAgentServicer_to_server
 from generated.agent.main_pb2 import (
-    GetEmbeddingRequest, GetEmbeddingResponse,
-    NewRecommendationsRequest, NewRecommendationsResponse
+    GetEmbeddingRequest, GetEmbeddingResponse, VectorFormat,
+    GetEmbeddingsRequest, GetEmbeddingsResponse,
+    NewRecommendationsRequest, NewRecommendationsResponse,
+    RegenerateRecommendationsRequest, RegenerateRecommendationsProgress,
+    RecommendationEventRequest, RecommendationEventResponse,
+    RecommendationEventType
 )
 
 import dotenv
 
 dotenv.load_dotenv()
 
-from rpc import AgentService
-from model import encode, generate_recommendations_for_user
+from rpc import AgentService, MetricsInterceptor
+from model import (
+    encode_vector, encode_many, pack_vector, seed_cache, get_batcher, get_cache,
+    get_executor, get_process_pool, warm_up, close_process_pool,
+    get_db_connection_pool, preload_recommendation_data,
+    RecommendationScheduler, Priority, QueueFull,
+    IngredientScoreCache, INGREDIENT_SCORES_CHANNEL,
+    MenuCatalogStore, CATALOG_CHANNEL, listen,
+    regenerate_recommendations, rescore_menuitems, ScoreRefresher,
+    metrics_registry, serve_metrics
+)
+
+MENU_EVENTS = {
+    RecommendationEventType.RECOMMENDATION_EVENT_MENU_LIKED,
+    RecommendationEventType.RECOMMENDATION_EVENT_MENU_UNLIKED,
+    RecommendationEventType.RECOMMENDATION_EVENT_MENU_DISLIKED,
+    RecommendationEventType.RECOMMENDATION_EVENT_MENU_UNDISLIKED,
+    RecommendationEventType.RECOMMENDATION_EVENT_MENU_SAVED,
+    RecommendationEventType.RECOMMENDATION_EVENT_MENU_UNSAVED
+}
+
+STALL_EVENTS = {
+    RecommendationEventType.RECOMMENDATION_EVENT_STALL_LIKED,
+    RecommendationEventType.RECOMMENDATION_EVENT_STALL_UNLIKED,
+    RecommendationEventType.RECOMMENDATION_EVENT_STALL_SAVED,
+    RecommendationEventType.RECOMMENDATION_EVENT_STALL_UNSAVED
+}
+
+def embedding_response(vector, format: VectorFormat) -> GetEmbeddingResponse:
+    if format == VectorFormat.VECTOR_FORMAT_FLOAT32:
+        packed = pack_vector(vector, "float32")
+    elif format == VectorFormat.VECTOR_FORMAT_FLOAT16:
+        packed = pack_vector(vector, "float16")
+    else:
+        return GetEmbeddingResponse(
+            vectors=str(vector.tolist())
+        )
+    return GetEmbeddingResponse(
+        packed=packed,
+        format=format,
+        dimensions=len(vector)
+    )
 
 class AgentServiceImpl(AgentService):
 
@@ -27,15 +73,73 @@ class AgentServiceImpl(AgentService):
             context.set_details(_e)
             raise ValueError(_e)
         try:
-            result = await encode(text)
-            return GetEmbeddingResponse(
-                vectors=result
-            )
+            result = await encode_vector(text)
+            return embedding_response(result, request.format)
         except:
             _e = "Unexpected exception while encoding: {}".format(text)
             context.set_code(StatusCode.INTERNAL)
             context.set_details(_e)
             raise RuntimeError(_e)
+
+    async def GetEmbeddings(self, request: GetEmbeddingsRequest, context: aio.ServicerContext) -> GetEmbeddingsResponse:
+        texts = list(request.texts)
+        if not texts or not all(texts):
+            _e = "Texts are empty, nothing to encode"
+            context.set_code(StatusCode.INVALID_ARGUMENT)
+            context.set_details(_e)
+            raise ValueError(_e)
+        try:
+            results = await encode_many(texts)
+            return GetEmbeddingsResponse(
+                embeddings=[embedding_response(r, request.format) for r in results]
+            )
+        except:
+            _e = "Unexpected exception while encoding {} texts".format(len(texts))
+            context.set_code(StatusCode.INTERNAL)
+            context.set_details(_e)
+            raise RuntimeError(_e)
+
+    async def StreamEmbeddings(self, request_iterator, context: aio.ServicerContext):
+        # Requests are read ahead and encoded concurrently (so they batch), a
+        # bounded number at a time; responses go out in request order.
+        in_flight: asyncio.Queue[asyncio.Task | None] = asyncio.Queue(
+            maxsize=get_batcher().max_batch * 4
+        )
+
+        async def embed(request: GetEmbeddingRequest) -> GetEmbeddingResponse:
+            if not request.text:
+                raise ValueError("Text is empty, nothing to encode")
+            return embedding_response(await encode_vector(request.text), request.format)
+
+        async def read():
+            try:
+                async for request in request_iterator:
+                    await in_flight.put(asyncio.create_task(embed(request)))
+            finally:
+                await in_flight.put(None)
+
+        reader = asyncio.create_task(read())
+        try:
+            while (task := await in_flight.get()) is not None:
+                try:
+                    yield await task
+                except ValueError as e:
+                    context.set_code(StatusCode.INVALID_ARGUMENT)
+                    context.set_details(str(e))
+                    raise
+                except Exception:
+                    _e = "Unexpected exception while encoding stream"
+                    context.set_code(StatusCode.INTERNAL)
+                    context.set_details(_e)
+                    raise RuntimeError(_e)
+            # Surface errors reading the request stream
+            await reader
+        finally:
+            reader.cancel()
+            while not in_flight.empty():
+                task = in_flight.get_nowait()
+                if task:
+                    task.cancel()
     
     async def NewRecommendations(self, request: NewRecommendationsRequest, context: aio.ServicerContext) -> NewRecommendationsResponse:
         user_id = request.user_id
@@ -44,17 +148,164 @@ class AgentServiceImpl(AgentService):
             context.set_code(StatusCode.INVALID_ARGUMENT)
             context.set_details(_e)
             raise ValueError(_e)
-        asyncio.create_task(generate_recommendations_for_user(user_id))
+        # Bursts for the same user are folded into one regeneration
+        try:
+            RecommendationScheduler.get().submit(user_id, Priority.INTERACTIVE)
+        except QueueFull as e:
+            context.set_code(StatusCode.RESOURCE_EXHAUSTED)
+            context.set_details(str(e))
+            raise
         return NewRecommendationsResponse()
 
+    async def RegenerateRecommendations(self, request: RegenerateRecommendationsRequest, context: aio.ServicerContext):
+        user_ids = list(request.user_ids) or None
+        try:
+            async for progress in regenerate_recommendations(user_ids):
+                yield RegenerateRecommendationsProgress(
+                    total=progress.total,
+                    done=progress.done,
+                    skipped=progress.skipped,
+                    elapsed_seconds=progress.elapsed,
+                    users_per_second=progress.users_per_second
+                )
+        except Exception as e:
+            _e = "Unexpected exception while regenerating recommendations: {}".format(e)
+            context.set_code(StatusCode.INTERNAL)
+            context.set_details(_e)
+            raise RuntimeError(_e)
+
+    async def RecommendationEvent(self, request: RecommendationEventRequest, context: aio.ServicerContext) -> RecommendationEventResponse:
+        user_id = request.user_id
+        if not user_id:
+            _e = "User id cannot be empty"
+            context.set_code(StatusCode.INVALID_ARGUMENT)
+            context.set_details(_e)
+            raise ValueError(_e)
+        if request.type in MENU_EVENTS | STALL_EVENTS and not request.object_id:
+            _e = "Object id cannot be empty"
+            context.set_code(StatusCode.INVALID_ARGUMENT)
+            context.set_details(_e)
+            raise ValueError(_e)
+
+        # Stalls do not take part in scoring yet, nothing changes
+        if request.type in STALL_EVENTS:
+            return RecommendationEventResponse(incremental=True, updated=0)
+
+        scheduler = RecommendationScheduler.get()
+        # A full run that has not finished yet covers this event as well
+        if request.type in MENU_EVENTS and not scheduler.scheduled(user_id):
+            # On a worker, so bursts of events are bounded like full runs
+            try:
+                updated = await scheduler.run_interactive(
+                    lambda: rescore_menuitems(user_id, [request.object_id])
+                )
+            except QueueFull as e:
+                context.set_code(StatusCode.RESOURCE_EXHAUSTED)
+                context.set_details(str(e))
+                raise
+            except Exception as e:
+                _e = "Unexpected exception while rescoring: {}".format(e)
+                context.set_code(StatusCode.INTERNAL)
+                context.set_details(_e)
+                raise RuntimeError(_e)
+            if updated is not None:
+                return RecommendationEventResponse(incremental=True, updated=updated)
+
+        # Preference changes can exclude menu items (a new allergy or diet), so
+        # the run is never shed: a full queue is reported to the caller instead
+        try:
+            scheduler.submit(user_id, Priority.INTERACTIVE, scheduler.event_debounce)
+        except QueueFull as e:
+            context.set_code(StatusCode.RESOURCE_EXHAUSTED)
+            context.set_details(str(e))
+            raise
+        return RecommendationEventResponse(incremental=False)
+
+SERVICE_NAME = "kueater.agent.KUEaterEmbeddingAgent"
+
+async def warm_up_service(db: str | None) -> None:
+    # The first request after a deploy should not wait for ONNX session setup
+    start = perf_counter()
+    await asyncio.get_running_loop().run_in_executor(get_executor(), warm_up)
+    print("Model warmed up in {:.2f}s".format(perf_counter() - start))
+
+    if not db:
+        return
+    try:
+        await preload_recommendation_data()
+    except Exception as e:
+        # Recommendations load it on demand, embeddings do not need it
+        print("Cannot preload recommendation data: {}".format(e))
+
+def register_metrics() -> None:
+    # Counters the components already keep, exported as gauges
+    metrics_registry.collect("kueater_encoder_batcher", lambda: get_batcher().stats())
+    metrics_registry.collect("kueater_embedding_cache", lambda: get_cache().stats())
+    metrics_registry.collect(
+        "kueater_inference_pool",
+        lambda: get_process_pool().stats() if get_process_pool() else {}
+    )
+    metrics_registry.collect(
+        "kueater_recommendation_scheduler", lambda: RecommendationScheduler.get().stats()
+    )
+    metrics_registry.collect(
+        "kueater_ingredient_scores", lambda: IngredientScoreCache.get().stats()
+    )
+    metrics_registry.collect(
+        "kueater_score_refresh", lambda: ScoreRefresher.get().stats()
+    )
+
 async def serve(port: int=50052) -> None:
-    server = aio.server()
+    server = aio.server(interceptors=[MetricsInterceptor()])
     add_KUEaterEmbeddingAgentServicer_to_server(AgentServiceImpl(), server=server)
     listen_addr = "[::]:{}".format(port)
     server.add_insecure_port(listen_addr)
     print("Starting server on {}".format(listen_addr))
-    await server.start()
-    await server.wait_for_termination()
+
+    health_servicer = health.aio.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(health_servicer, server)
+
+    # Keep reference data loaded, and drop it as soon as it is regenerated
+    background: list[asyncio.Task] = []
+    db = getenv("DATABASE_URL")
+    if db:
+        catalog = MenuCatalogStore.get()
+        background.append(asyncio.create_task(listen(db, {
+            INGREDIENT_SCORES_CHANNEL: IngredientScoreCache.get().invalidate,
+            CATALOG_CHANNEL: catalog.invalidate
+        })))
+        background.append(asyncio.create_task(catalog.run(get_db_connection_pool())))
+
+    RecommendationScheduler.get().start()
+
+    metrics_server = None
+    metrics_port = getenv("METRICS_PORT")
+    if metrics_port:
+        register_metrics()
+        metrics_host = getenv("METRICS_HOST") or "127.0.0.1"
+        metrics_server = await serve_metrics(int(metrics_port), metrics_host)
+        print("Serving metrics on http://{}:{}/metrics".format(metrics_host, metrics_port))
+
+    if getenv("EMBEDDING_CACHE_SEED"):
+        print("Seeded embedding cache with {} texts".format(seed_cache()))
+
+    try:
+        # The port only opens once the model and reference data are loaded, so
+        # no RPC waits for them, whether or not the client checks health first
+        await warm_up_service(db)
+        await server.start()
+        for service in ("", SERVICE_NAME):
+            await health_servicer.set(service, health_pb2.HealthCheckResponse.SERVING)
+        print("Ready to serve")
+        await server.wait_for_termination()
+    finally:
+        await health_servicer.enter_graceful_shutdown()
+        for task in background:
+            task.cancel()
+        RecommendationScheduler.get().cancel()
+        close_process_pool()
+        if metrics_server:
+            metrics_server.close()
 
 if __name__ == "__main__":
 
@@ -0,0 +1,138 @@
+import asyncio
+import dataclasses
+
+import pytest
+
+from src.model.batch import regenerate_recommendations
+from src.model.incremental import rescore_menuitems
+from src.model.memory_repository import InMemoryRepository
+from src.model.recommendations import generate_recommendations_for_user
+from src.model.repository import set_repository
+from src.model.scheduler import RecommendationScheduler
+from src.model.scoring import ScoringEngine, UserScores
+
+
+@pytest.fixture(scope="module")
+def loop():
+    # The scheduler and the score refresher are singletons bound to the loop
+    # they first ran on, so every test shares one
+    loop = asyncio.new_event_loop()
+    yield loop
+    RecommendationScheduler.get().cancel()
+    loop.close()
+
+
+@pytest.fixture
+def repository(monkeypatch):
+    monkeypatch.delenv("RECOMMENDATION_TOP_K", raising=False)
+    repository = InMemoryRepository.from_files(seed=0)
+    repository.add_users(repository.synthetic_users(12))
+    set_repository(repository)
+    yield repository
+    set_repository(None)
+
+
+def expected_result(repository, user) -> UserScores:
+    # Scored by an engine of its own, not the one cached for the runs
+    engine = ScoringEngine.from_catalog(
+        repository.catalog, repository.ingredient_scores
+    )
+    (result,) = engine.score([user])
+    return result
+
+
+def expected_scores(repository, user) -> dict[str, float]:
+    result = expected_result(repository, user)
+    return dict(zip(result.menu_ids, result.scores.tolist()))
+
+
+def written_scores(repository, user_id) -> dict[str, float]:
+    return {m: s for m, (s, _) in repository.menuitem_scores[user_id].items()}
+
+
+def test_generate_recommendations_for_user(loop, repository):
+    user = next(iter(repository.users.values()))
+    loop.run_until_complete(generate_recommendations_for_user(user.user_id))
+
+    assert list(repository.menuitem_scores) == [user.user_id]
+    assert written_scores(repository, user.user_id) == pytest.approx(
+        expected_scores(repository, user)
+    )
+    assert repository.refreshes == 1
+
+    # Unknown users are skipped
+    loop.run_until_complete(generate_recommendations_for_user("no-such-user"))
+    assert "no-such-user" not in repository.menuitem_scores
+
+
+def test_generate_recommendations_keeps_top_k(loop, repository, monkeypatch):
+    monkeypatch.setenv("RECOMMENDATION_TOP_K", "10")
+    user = next(iter(repository.users.values()))
+    loop.run_until_complete(generate_recommendations_for_user(user.user_id))
+
+    result = expected_result(repository, user)
+    expected = dict(zip(result.menu_ids, result.scores.tolist()))
+    excluded = {m for m, e in zip(result.menu_ids, result.excluded) if e}
+    written = written_scores(repository, user.user_id)
+
+    # Every excluded menu item is stored, so it is never recommended
+    assert excluded <= set(written)
+    kept = [m for m in written if m not in excluded]
+    assert len(kept) == 10
+    best = sorted((s for m, s in expected.items() if m not in excluded), reverse=True)
+    assert sorted((expected[m] for m in kept), reverse=True) == best[:10]
+    assert written == pytest.approx({m: expected[m] for m in written})
+
+
+def test_regenerate_recommendations(loop, repository):
+    user_ids = sorted(repository.users)
+    # Unknown users are counted as skipped
+    wanted = user_ids + ["no-such-user"]
+
+    async def regenerate():
+        return [p async for p in regenerate_recommendations(wanted, chunk_size=5)]
+
+    progress = loop.run_until_complete(regenerate())
+
+    # One progress per chunk, then the final one
+    assert len(progress) == 4
+    assert (progress[-1].done, progress[-1].skipped) == (len(user_ids), 1)
+    assert sorted(repository.menuitem_scores) == user_ids
+    for user_id in user_ids:
+        assert written_scores(repository, user_id) == pytest.approx(
+            expected_scores(repository, repository.users[user_id])
+        )
+    # One refresh for the whole batch
+    assert repository.refreshes == 1
+
+
+def test_rescore_menuitems(loop, repository):
+    user = next(iter(repository.users.values()))
+    loop.run_until_complete(generate_recommendations_for_user(user.user_id))
+    before = written_scores(repository, user.user_id)
+
+    # A like of a menu item not liked yet
+    menu_id = next(m.id for m in repository.menus if m.id not in user.liked_menus)
+    liked = dataclasses.replace(user, liked_menus=user.liked_menus + [menu_id])
+    repository.add_users([liked])
+
+    updated = loop.run_until_complete(rescore_menuitems(user.user_id, [menu_id]))
+
+    assert updated == 1
+    after = written_scores(repository, user.user_id)
+    assert after[menu_id] == pytest.approx(expected_scores(repository, liked)[menu_id])
+    assert after[menu_id] == pytest.approx(before[menu_id] + 10)
+    # Only that menu item is rewritten
+    assert {m: s for m, s in after.items() if m != menu_id} == {
+        m: s for m, s in before.items() if m != menu_id
+    }
+    assert repository.refreshes == 2
+
+
+def test_rescore_menuitems_without_scores(loop, repository):
+    # Users without scores need a full generation first
+    user = next(iter(repository.users.values()))
+    menu_id = repository.menus[0].id
+    assert loop.run_until_complete(rescore_menuitems(user.user_id, [menu_id])) is None
+    assert loop.run_until_complete(rescore_menuitems("no-such-user", [menu_id])) == 0
+    assert repository.menuitem_scores == {}
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from src.model import scheduler as scheduler_module
+from src.model.scheduler import Priority, QueueFull, RecommendationScheduler
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    # A scheduler of its own (the singleton is bound to the loop it ran on),
+    # running a stand-in for generate_recommendations_for_user
+    monkeypatch.setattr(
+        RecommendationScheduler, "_RecommendationScheduler__instance", None
+    )
+    monkeypatch.setenv("RECOMMENDATION_DEBOUNCE_MS", "0")
+    monkeypatch.setenv("RECOMMENDATION_EVENT_DEBOUNCE_MS", "200")
+    runs = []
+
+    async def generate(user_id):
+        runs.append(user_id)
+
+    monkeypatch.setattr(scheduler_module, "generate_recommendations_for_user", generate)
+    return runs
+
+
+def test_requests_are_not_debounced(runs):
+    async def main():
+        scheduler = RecommendationScheduler.get()
+        scheduler.submit("user")
+        scheduler.submit("event", debounce=scheduler.event_debounce)
+        await asyncio.sleep(0.05)
+        assert runs == ["user"]
+
+        # A request for a user with an event waiting runs right away
+        scheduler.submit("event")
+        await asyncio.sleep(0.05)
+        assert runs == ["user", "event"]
+        assert scheduler.stats()["coalesced"] == 1
+        scheduler.cancel()
+
+    asyncio.run(main())
+
+
+def test_events_are_folded_into_one_run(runs):
+    async def main():
+        scheduler = RecommendationScheduler.get()
+        for _ in range(5):
+            scheduler.submit("user", debounce=scheduler.event_debounce)
+        await asyncio.sleep(0.1)
+        assert runs == []
+        await asyncio.sleep(0.2)
+        assert runs == ["user"]
+        scheduler.cancel()
+
+    asyncio.run(main())
+
+
+def test_event_runs_are_not_shed(runs, monkeypatch):
+    monkeypatch.setenv("RECOMMENDATION_QUEUE_SIZE", "1")
+
+    async def main():
+        scheduler = RecommendationScheduler.get()
+        # Like RecommendationEvent does for a preference change
+        scheduler.submit("event", Priority.INTERACTIVE, scheduler.event_debounce)
+        with pytest.raises(QueueFull):
+            scheduler.submit("user")
+        await asyncio.sleep(0.3)
+        assert runs == ["event"]
+        assert scheduler.stats()["shed"] == 0
+        scheduler.cancel()
+
+    asyncio.run(main())
+
+
+def blocked_worker(scheduler):
+    # Keeps the only worker busy until the returned event is set
+    gate = asyncio.Event()
+    task = asyncio.create_task(scheduler.run_batch(gate.wait))
+    return gate, task
+
+
+def test_interactive_work_goes_before_batch_work(runs, monkeypatch):
+    monkeypatch.setenv("RECOMMENDATION_WORKERS", "1")
+    order = []
+
+    async def work(name):
+        order.append(name)
+        return name
+
+    async def main():
+        scheduler = RecommendationScheduler.get()
+        gate, blocked = blocked_worker(scheduler)
+        await asyncio.sleep(0.01)
+        batch = asyncio.create_task(scheduler.run_batch(lambda: work("batch")))
+        call = asyncio.create_task(scheduler.run_interactive(lambda: work("call")))
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["queue_depth"] == 1
+
+        gate.set()
+        assert await call == "call"
+        assert await batch == "batch"
+        await blocked
+        assert order == ["call", "batch"]
+        assert scheduler.stats()["interactive_runs"] == 1
+        scheduler.cancel()
+
+    asyncio.run(main())
+
+
+def test_interactive_work_is_bounded(runs, monkeypatch):
+    monkeypatch.setenv("RECOMMENDATION_WORKERS", "1")
+    monkeypatch.setenv("RECOMMENDATION_QUEUE_SIZE", "1")
+
+    async def work():
+        return 1
+
+    async def main():
+        scheduler = RecommendationScheduler.get()
+        gate, blocked = blocked_worker(scheduler)
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(scheduler.run_interactive(work))
+        await asyncio.sleep(0.01)
+        with pytest.raises(QueueFull):
+            await scheduler.run_interactive(work)
+        with pytest.raises(QueueFull):
+            scheduler.submit("user")
+
+        gate.set()
+        assert await queued == 1
+        await blocked
+        assert scheduler.stats()["rejected"] == 2
+        scheduler.cancel()
+
+    asyncio.run(main())
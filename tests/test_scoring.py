@@ -0,0 +1,198 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.model.scoring import ScoringEngine, UserContext, common_word_normalize
+
+DIETS = ["Halal", "Vegan", "Keto", "Low-Fat"]
+ALLERGENS = ["Eggs", "Soy", "Nuts"]
+WORDS = ["Pork", "Rice", "Tea"]
+# Scores on the thresholds of the rules, so every comparison is exercised
+THRESHOLDS = [0.4, 0.5, 0.7, 0.8]
+
+
+def reference(menu_ids, menu_ingredients, ingredient_scores, similarity, user):
+    # The per-menu rule loop recommendations were generated with before the
+    # engine, one menu item at a time. {menu id: (score, reason kinds)}
+    out = {}
+    for menu, ingredients in zip(menu_ids, menu_ingredients):
+        final_score = 0
+        warn_reasons = []
+        good_reasons = []
+
+        diet_scores = [
+            ingredient_scores[i][0] for i in ingredients if i in ingredient_scores
+        ]
+        allergens_scores = [
+            ingredient_scores[i][1] for i in ingredients if i in ingredient_scores
+        ]
+
+        if user.diets:
+            diet_reasoning = {"incompatible": set(), "maybe": set()}
+            curr_score = 1.0
+            for diet in user.diets:
+                for scoreset in diet_scores:
+                    s = scoreset[diet]
+                    if s <= 0.4:
+                        diet_reasoning["incompatible"].add(diet)
+                    elif s <= 0.7:
+                        diet_reasoning["maybe"].add(diet)
+                    if s < curr_score:
+                        curr_score = s
+            if diet_reasoning["incompatible"]:
+                warn_reasons.append(
+                    ("Not compatible with your diet", diet_reasoning["incompatible"])
+                )
+            elif diet_reasoning["maybe"]:
+                warn_reasons.append(
+                    ("Maybe compatible with your diet", diet_reasoning["maybe"])
+                )
+            if curr_score <= 0.4:
+                final_score = -999
+            elif curr_score <= 0.8:
+                final_score -= 20 * len(diet_reasoning["maybe"])
+
+        if user.allergies:
+            allergen_reasoning = {"contains": set(), "unsure": set()}
+            curr_score = 0.0
+            for allergen in user.allergies:
+                for scoreset in allergens_scores:
+                    s = scoreset[allergen]
+                    if s >= 0.7:
+                        allergen_reasoning["contains"].add(allergen)
+                    elif s >= 0.5:
+                        allergen_reasoning["unsure"].add(allergen)
+                    if s > curr_score:
+                        curr_score = s
+            if allergen_reasoning["contains"]:
+                warn_reasons.append(
+                    ("Contains allergen", allergen_reasoning["contains"])
+                )
+            elif allergen_reasoning["unsure"]:
+                warn_reasons.append(
+                    ("May contain traces of", allergen_reasoning["unsure"])
+                )
+            if curr_score >= 0.7:
+                final_score = -999
+            elif curr_score >= 0.5:
+                final_score -= 20 * len(allergen_reasoning["unsure"])
+
+        if menu in user.disliked_menus:
+            final_score -= 10
+
+        scores = {}
+        for word in user.favorite_dishes:
+            if word in similarity:
+                scores[word] = float(common_word_normalize(similarity[word][menu]))
+        if scores:
+            final_score += sum(scores.values())
+            if min(scores.values()) >= 6:
+                good_reasons.append(("Because you like", set(scores)))
+
+        if menu in user.liked_menus:
+            final_score += 10
+        if menu in user.saved_menus:
+            final_score += 5
+
+        out[menu] = (final_score, good_reasons if final_score >= 10 else warn_reasons)
+    return out
+
+
+def parse(reasoning: str):
+    # Reason kinds and names, the order names are listed in is not compared
+    reasons = []
+    for part in reasoning.split(r"\n") if reasoning else []:
+        if part.startswith("Because you like "):
+            reasons.append(("Because you like", part.removeprefix("Because you like ")))
+        else:
+            kind, _, names = part.partition(": ")
+            reasons.append((kind, set(names.split(", "))))
+    return reasons
+
+
+def same_reasons(reasoning: str, expected) -> bool:
+    actual = parse(reasoning)
+    if len(actual) != len(expected):
+        return False
+    for (kind, names), (expected_kind, expected_names) in zip(actual, expected):
+        if kind != expected_kind:
+            return False
+        # One of the favorite dishes is picked at random
+        if kind == "Because you like":
+            if names not in expected_names:
+                return False
+        elif names != expected_names:
+            return False
+    return True
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    rng = random.Random(1)
+    ingredients = [f"ingredient-{i}" for i in range(60)]
+    # A few ingredients have no scores and put no constraint on a menu item
+    ingredient_scores = {
+        i: (
+            {d: rng.choice([rng.random(), rng.choice(THRESHOLDS)]) for d in DIETS},
+            {a: rng.choice([rng.random(), rng.choice(THRESHOLDS)]) for a in ALLERGENS},
+        )
+        for i in ingredients[:55]
+    }
+    menu_ids = [f"menu-{m}" for m in range(300)]
+    menu_ingredients = [rng.sample(ingredients, rng.randint(0, 6)) for _ in menu_ids]
+    similarity = {w: {m: rng.uniform(-0.2, 1) for m in menu_ids} for w in WORDS}
+    users = [
+        UserContext(
+            f"user-{u}",
+            diets=rng.sample(DIETS, rng.randint(0, 3)),
+            allergies=rng.sample(ALLERGENS, rng.randint(0, 2)),
+            favorite_dishes=rng.sample(WORDS + ["Unknown"], rng.randint(0, 3)),
+            liked_menus=rng.sample(menu_ids, 20),
+            disliked_menus=rng.sample(menu_ids, 20),
+            saved_menus=rng.sample(menu_ids, 20),
+        )
+        for u in range(80)
+    ]
+    engine = ScoringEngine(
+        menu_ids,
+        menu_ingredients,
+        ingredient_scores,
+        WORDS,
+        np.array([[similarity[w][m] for m in menu_ids] for w in WORDS]),
+    )
+    return engine, menu_ids, menu_ingredients, ingredient_scores, similarity, users
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 256])
+def test_engine_matches_rule_loop(catalog, chunk_size):
+    engine, menu_ids, menu_ingredients, ingredient_scores, similarity, users = catalog
+    results = engine.score(users, chunk_size=chunk_size)
+
+    mismatches = []
+    for user, result in zip(users, results):
+        assert result.user_id == user.user_id
+        expected = reference(
+            menu_ids, menu_ingredients, ingredient_scores, similarity, user
+        )
+        for menu, score, reasoning in zip(
+            result.menu_ids, result.scores, result.reasonings
+        ):
+            expected_score, expected_reasons = expected[menu]
+            if score != pytest.approx(expected_score, abs=1e-9) or not same_reasons(
+                reasoning, expected_reasons
+            ):
+                mismatches.append((user.user_id, menu))
+    assert not mismatches
+
+
+def test_restricted_engine_matches_full_engine(catalog):
+    engine, menu_ids, *_, users = catalog
+    wanted = menu_ids[::17] + ["not-a-menu"]
+    restricted = engine.restricted_to(wanted)
+    assert restricted.menu_ids == menu_ids[::17]
+
+    for full, part in zip(engine.score(users), restricted.score(users)):
+        columns = [full.menu_ids.index(m) for m in part.menu_ids]
+        np.testing.assert_array_equal(part.scores, full.scores[columns])
+        np.testing.assert_array_equal(part.excluded, full.excluded[columns])